@@ -0,0 +1,208 @@
+import numpy as np
+import argparse
+import hashlib
+import os
+import time
+from multiprocessing import Pool
+from diskCache import loadEntry, saveEntry, evictCache
+
+engineVersion = 1
+"""
+Included in the cache keys, so that tiles are never reused once the way they are calculated has changed.
+"""
+
+def linspace(minValue, maxValue, num, dtype = np.float32):
+	"""
+	The sketch's linspace: `num` values from `minValue` up to (but not including) `maxValue`, worked out in the same order and (with the default `dtype`) the same float precision.
+	"""
+	minValue, maxValue = dtype(minValue), dtype(maxValue)
+	delta = (maxValue - minValue) / dtype(num)
+	return minValue + np.arange(num, dtype = dtype) * delta
+
+def interiorMask(re, im):
+	"""
+	Return which of the points `re` + `im`i are in the main cardioid or the period-2 bulb of the Mandelbrot set, where the orbit of 0 is known never to escape.
+	"""
+	re, im = np.asarray(re, dtype = float), np.asarray(im, dtype = float)
+	q = (re - 0.25) ** 2 + im ** 2
+	return (q * (q + re - 0.25) <= 0.25 * im ** 2) | ((re + 1) ** 2 + im ** 2 <= 1 / 16)
+
+def escapeTime(re, im, iterations, julia = None, dtype = np.float32, periodCheck = True, known = None):
+	"""
+	Count the iterations of z -> z^2 + c for which |z| <= 2, up to `iterations`, at every point of the grid `re` (columns) by `im` (rows), as ProcessIters does: for the Mandelbrot set (`julia` None) c is the point and z starts at 0, and for the Julia set of c = `julia` (a complex number) z starts at the point. The arithmetic is done in `dtype`, which by default is float like the sketch's, so the counts are the same as its.
+	All the points are iterated together, and those which have escaped are dropped from the arrays as they go, so the work follows the number of points still iterating. For the Mandelbrot set the points in the main cardioid and period-2 bulb are given the full count without iterating at all, and (if `periodCheck`) any orbit which lands exactly on a value it had before (compared with one saved at every power of 2 iterations) is stopped and given the full count, since the iteration is deterministic so it would repeat forever.
+	Points whose count is already `known` (an array of counts with -1 where they aren't) aren't iterated.
+	Returns the (len(im), len(re)) counts.
+	"""
+	re, im = np.asarray(re, dtype = dtype), np.asarray(im, dtype = dtype)
+	counts = np.full((len(im), len(re)), -1, dtype = np.int32) if known is None else np.array(known, dtype = np.int32)
+	gridRe, gridIm = np.broadcast_to(re, counts.shape), np.broadcast_to(im[:, None], counts.shape)
+	if julia is None:
+		counts[(counts < 0) & interiorMask(gridRe, gridIm)] = iterations
+
+	idx = np.flatnonzero(counts < 0)
+	counts = counts.ravel()
+	if julia is None:
+		cRe, cIm = gridRe.ravel()[idx], gridIm.ravel()[idx]
+		zRe, zIm = np.zeros(len(idx), dtype = dtype), np.zeros(len(idx), dtype = dtype)
+	else:
+		cRe, cIm = dtype(julia.real), dtype(julia.imag)
+		zRe, zIm = gridRe.ravel()[idx], gridIm.ravel()[idx]
+	savedRe, savedIm, nextSave = zRe.copy(), zIm.copy(), 1
+
+	for n in range(iterations):
+		# Drop the points which have escaped, as well as those which have come back round to where they were
+		keep = zRe * zRe + zIm * zIm <= 4
+		counts[idx[~keep]] = n
+		if periodCheck and n > 0:
+			periodic = keep & (zRe == savedRe) & (zIm == savedIm)
+			counts[idx[periodic]] = iterations
+			keep &= ~periodic
+		if not np.all(keep):
+			idx, zRe, zIm, savedRe, savedIm = idx[keep], zRe[keep], zIm[keep], savedRe[keep], savedIm[keep]
+			if julia is None:
+				cRe, cIm = cRe[keep], cIm[keep]
+		if len(idx) == 0:
+			break
+		if periodCheck and n == nextSave:
+			savedRe, savedIm, nextSave = zRe.copy(), zIm.copy(), 2 * nextSave
+
+		zRe, zIm = zRe * zRe - zIm * zIm + cRe, dtype(2) * zRe * zIm + cIm
+
+	counts[idx] = iterations
+	return counts.reshape(len(im), len(re))
+
+def tileKey(re, im, iterations, julia, dtype):
+	"""
+	Return the cache key of the tile `re` by `im`: a hash of the engine version, the number of iterations, the value of c for a Julia set (or nothing for the Mandelbrot set), the precision and the points themselves, so that any view which has a tile with exactly the same points shares it.
+	"""
+	key = hashlib.sha256()
+	key.update(np.array([engineVersion, iterations, len(re), len(im)]).tobytes())
+	key.update(np.dtype(dtype).name.encode())
+	key.update(np.array([] if julia is None else [julia.real, julia.imag]).tobytes())
+	for value in (re, im):
+		key.update((np.asarray(value, dtype = dtype) + dtype(0)).tobytes()) # + 0 turns -0.0 into 0.0
+	return key.hexdigest()
+
+def solveTile(args):
+	"""
+	Function which is executed in a worker process. Each call works out the counts of one tile, or reads them from the cache (if `cacheDir` isn't None), in which each tile is a .npy file named by its tileKey (see diskCache).
+	If `coarse` is given, it is the points of the tile at twice the pixel size which holds every other point of this one (as (re, im, rowOffset, colOffset)), and if that is in the cache its counts are reused for those points, so only three quarters of the tile is iterated.
+	Returns the counts and whether they (all) came from the cache.
+	"""
+	k, re, im, iterations, julia, dtype, periodCheck, cacheDir, coarse = args
+	if cacheDir is None:
+		return k, escapeTime(re, im, iterations, julia, dtype, periodCheck), False
+
+	key = tileKey(re, im, iterations, julia, dtype)
+	counts = loadEntry(cacheDir, key, ".npy", np.load)
+	if counts is not None:
+		return k, counts, True
+
+	known = None
+	if coarse is not None:
+		coarseRe, coarseIm, rowOffset, colOffset = coarse
+		coarseCounts = loadEntry(cacheDir, tileKey(coarseRe, coarseIm, iterations, julia, dtype), ".npy", np.load)
+		if coarseCounts is not None:
+			known = np.full((len(im), len(re)), -1, dtype = np.int32)
+			known[::2, ::2] = coarseCounts[rowOffset:rowOffset + (len(im) + 1) // 2, colOffset:colOffset + (len(re) + 1) // 2]
+	counts = escapeTime(re, im, iterations, julia, dtype, periodCheck, known)
+	saveEntry(cacheDir, key, ".npy", lambda f: np.save(f, counts))
+	return k, counts, False
+
+def runTiles(tiles, shape, numWorkers, cacheDir, cacheBytes, verbose):
+	"""
+	Work out every tile in `tiles` (a list of the arguments of solveTile, without the index, each with the slices of the output it fills) with `numWorkers` processes, returning the counts as one array of `shape`.
+	"""
+	counts = np.zeros(shape, dtype = np.int32)
+	startTime, numCached = time.time(), 0
+	with Pool(numWorkers) as pool:
+		for k, tileCounts, cached in pool.imap_unordered(solveTile, [(k,) + args for k, (args, _) in enumerate(tiles)]):
+			rows, cols, cropRows, cropCols = tiles[k][1]
+			counts[rows, cols] = tileCounts[cropRows, cropCols]
+			numCached += cached
+	if cacheDir is not None:
+		evictCache(cacheDir, cacheBytes, ".npy")
+	if verbose: print(f"{len(tiles)} tiles ({numCached} from the cache) in {time.time() - startTime:.2f}s")
+	return counts
+
+def render(limits, density = 1000, iterations = 255, julia = None, dtype = np.float32, periodCheck = True, tileSize = 125, numWorkers = None, cacheDir = None, cacheBytes = 2 ** 30, verbose = True):
+	"""
+	Work out the counts for the view `limits` (minRe, maxRe, minIm, maxIm) at `density` by `density` points exactly as generateSet in MandelbrotGenerator (`julia` None) or JuliaGenerator (c = `julia`) does, except that the work is split into `tileSize` by `tileSize` tiles shared among `numWorkers` processes rather than columns shared among threads (so every column is done even if `density` isn't a multiple of the number of threads).
+	If `cacheDir` is given, the tiles are cached there (up to `cacheBytes`), so going back to a view which has been seen before, or to the Julia set of a value of c which has been picked before, reuses them.
+	Returns the (density, density) counts, with the imaginary part along the rows as in the sketch.
+	"""
+	reRange, imRange = linspace(limits[0], limits[1], density, dtype), linspace(limits[2], limits[3], density, dtype)
+	tiles = []
+	for i in range(0, density, tileSize):
+		for j in range(0, density, tileSize):
+			rows, cols = slice(i, min(i + tileSize, density)), slice(j, min(j + tileSize, density))
+			tiles.append(((reRange[cols], imRange[rows], iterations, julia, dtype, periodCheck, cacheDir, None), (rows, cols, slice(None), slice(None))))
+	return runTiles(tiles, (density, density), numWorkers, cacheDir, cacheBytes, verbose)
+
+def renderLattice(centre, pixelSize, shape, iterations = 255, julia = None, dtype = np.float32, periodCheck = True, tileSize = 128, numWorkers = None, cacheDir = None, cacheBytes = 2 ** 30, verbose = True):
+	"""
+	Work out the counts for a view of `shape` (rows, columns) points centred on `centre` (a complex number), with the points on the lattice of multiples of `pixelSize` and the tiles aligned to every `tileSize` (even) points of it, rather than spread evenly between limits as the sketch does.
+	Any two views with the same pixel size then share all but their edge tiles, so panning only works out the new tiles; and every other point of a view is a point of the view at twice the pixel size, so with a cache each step of a zoom sequence which halves the pixel size reuses a quarter of its points from the step before (see solveTile).
+	Returns the counts, with the imaginary part along the rows as in render.
+	"""
+	if tileSize % 2 != 0:
+		raise ValueError("tileSize must be even")
+	numRows, numCols = shape
+	startRow, startCol = int(round(centre.imag / pixelSize)) - numRows // 2, int(round(centre.real / pixelSize)) - numCols // 2
+	points = lambda start, size: (np.arange(start, start + size) * pixelSize).astype(dtype)
+
+	tiles = []
+	for tileRow in range(startRow // tileSize, (startRow + numRows - 1) // tileSize + 1):
+		for tileCol in range(startCol // tileSize, (startCol + numCols - 1) // tileSize + 1):
+			# Work out the whole tile (so that it can be shared), but only keep the part in the view
+			top, left = tileRow * tileSize, tileCol * tileSize
+			rows = slice(max(top, startRow) - startRow, min(top + tileSize, startRow + numRows) - startRow)
+			cols = slice(max(left, startCol) - startCol, min(left + tileSize, startCol + numCols) - startCol)
+			crop = (slice(rows.start + startRow - top, rows.stop + startRow - top), slice(cols.start + startCol - left, cols.stop + startCol - left))
+			coarse = (np.arange(tileCol // 2 * tileSize, tileCol // 2 * tileSize + tileSize) * 2 * pixelSize).astype(dtype), (np.arange(tileRow // 2 * tileSize, tileRow // 2 * tileSize + tileSize) * 2 * pixelSize).astype(dtype), tileRow % 2 * tileSize // 2, tileCol % 2 * tileSize // 2
+			tiles.append(((points(left, tileSize), points(top, tileSize), iterations, julia, dtype, periodCheck, cacheDir, coarse), (rows, cols) + crop))
+	return runTiles(tiles, shape, numWorkers, cacheDir, cacheBytes, verbose)
+
+def colourise(counts, iterations):
+	"""
+	Colour the counts as draw does in the sketch, returning an RGB image with the imaginary part increasing up the image.
+	"""
+	x = counts.astype(np.int64)
+	image = np.zeros(counts.shape + (3,), dtype = np.int64)
+	low, mid, high = x < iterations // 3, (iterations // 3 <= x) & (x < iterations * 2 // 3), (iterations * 2 // 3 <= x) & (x < iterations)
+	image[low, 1] = 3 * x[low]
+	image[mid] = np.stack([3 * x[mid], np.full(np.count_nonzero(mid), 255), np.zeros(np.count_nonzero(mid), dtype = np.int64)], axis = 1)
+	image[high] = np.stack([np.full(np.count_nonzero(high), 255), np.full(np.count_nonzero(high), 255), 3 * x[high]], axis = 1)
+	return np.flipud(np.clip(image, 0, 255).astype(np.uint8))
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Render the Mandelbrot set or a Julia set without the sketch, as counts (.npy) and optionally an image.")
+	parser.add_argument("--julia", type = float, nargs = 2, default = None, metavar = ("RE", "IM"), help = "render the Julia set of c = RE + IMi rather than the Mandelbrot set")
+	parser.add_argument("--limits", type = float, nargs = 4, default = None, metavar = ("MINRE", "MAXRE", "MINIM", "MAXIM"), help = "the view (the sketch's defaults by default)")
+	parser.add_argument("--density", type = int, default = 1000)
+	parser.add_argument("--iterations", type = int, default = 255)
+	parser.add_argument("--double", action = "store_true", help = "iterate in double rather than float precision")
+	parser.add_argument("--zoom", type = float, nargs = 3, default = None, metavar = ("RE", "IM", "FRAMES"), help = "render a zoom sequence into RE + IMi instead, halving the pixel size each frame")
+	parser.add_argument("--workers", type = int, default = None, help = "number of worker processes")
+	parser.add_argument("--cache", default = None, help = "directory to cache tiles in")
+	parser.add_argument("--output", default = "render", help = "prefix of the output files")
+	parser.add_argument("--png", action = "store_true", help = "save images as well as the counts")
+	args = parser.parse_args()
+
+	julia = complex(*args.julia) if args.julia is not None else None
+	dtype = np.float64 if args.double else np.float32
+	if args.zoom is None:
+		limits = args.limits if args.limits is not None else ([-2, 1, -1.5, 1.5] if julia is None else [-2, 2, -2, 2])
+		frames = [render(limits, args.density, args.iterations, julia, dtype, numWorkers = args.workers, cacheDir = args.cache)]
+	else:
+		centre, pixelSize = complex(args.zoom[0], args.zoom[1]), 2.0 ** np.ceil(np.log2(4 / args.density))
+		frames = [renderLattice(centre, pixelSize / 2 ** k, (args.density, args.density), args.iterations, julia, dtype, numWorkers = args.workers, cacheDir = args.cache) for k in range(int(args.zoom[2]))]
+
+	for k, counts in enumerate(frames):
+		name = args.output if len(frames) == 1 else f"{args.output}{k}"
+		np.save(f"{name}.npy", counts)
+		if args.png:
+			import matplotlib.pyplot as plt
+			plt.imsave(f"{name}.png", colourise(counts, args.iterations))
+	print(f"Saved {len(frames)} frame(s) to {args.output}")
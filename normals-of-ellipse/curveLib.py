@@ -0,0 +1,136 @@
+import numpy as np
+from collections import namedtuple
+
+Curve = namedtuple("Curve", ["x", "y", "dx", "dy", "ddx", "ddy"])
+"""
+A smooth closed curve (x(t), y(t)) for t in [0, 2*pi), given by vectorized functions of t for x, y and their first and second derivatives.
+"""
+
+def ellipseCurve(a, b):
+	"""
+	The ellipse used everywhere else, (a cos(t), b sin(t)).
+	"""
+	return Curve(lambda t: a * np.cos(t), lambda t: b * np.sin(t), lambda t: -a * np.sin(t), lambda t: b * np.cos(t), lambda t: -a * np.cos(t), lambda t: -b * np.sin(t))
+
+def polarCurve(r, dr, ddr):
+	"""
+	The curve with polar equation r = `r`(t), given with its first and second derivatives `dr` and `ddr`.
+	"""
+	return Curve(
+		lambda t: r(t) * np.cos(t),
+		lambda t: r(t) * np.sin(t),
+		lambda t: dr(t) * np.cos(t) - r(t) * np.sin(t),
+		lambda t: dr(t) * np.sin(t) + r(t) * np.cos(t),
+		lambda t: ddr(t) * np.cos(t) - 2 * dr(t) * np.sin(t) - r(t) * np.cos(t),
+		lambda t: ddr(t) * np.sin(t) + 2 * dr(t) * np.cos(t) - r(t) * np.sin(t)
+	)
+
+def superellipseCurve(a, b, n):
+	"""
+	The superellipse |x / a|^n + |y / b|^n = 1, for an even integer `n` (so that it is smooth), parametrised by polar angle.
+	"""
+	F = lambda t: (np.cos(t) / a) ** n + (np.sin(t) / b) ** n
+	dF = lambda t: n * (-(np.cos(t) / a) ** (n - 1) * np.sin(t) / a + (np.sin(t) / b) ** (n - 1) * np.cos(t) / b)
+	ddF = lambda t: n * ((n - 1) * (np.cos(t) / a) ** (n - 2) * (np.sin(t) / a) ** 2 - (np.cos(t) / a) ** n + (n - 1) * (np.sin(t) / b) ** (n - 2) * (np.cos(t) / b) ** 2 - (np.sin(t) / b) ** n)
+
+	r = lambda t: F(t) ** (-1 / n)
+	dr = lambda t: -F(t) ** (-1 / n - 1) * dF(t) / n
+	ddr = lambda t: -((-1 / n - 1) * F(t) ** (-1 / n - 2) * dF(t) ** 2 + F(t) ** (-1 / n - 1) * ddF(t)) / n
+	return polarCurve(r, dr, ddr)
+
+def cardioidCurve(a):
+	"""
+	The cardioid (a (2 cos(t) - cos(2t)), a (2 sin(t) - sin(2t))), which has a cusp at t = 0.
+	"""
+	return Curve(
+		lambda t: a * (2 * np.cos(t) - np.cos(2 * t)),
+		lambda t: a * (2 * np.sin(t) - np.sin(2 * t)),
+		lambda t: a * (-2 * np.sin(t) + 2 * np.sin(2 * t)),
+		lambda t: a * (2 * np.cos(t) - 2 * np.cos(2 * t)),
+		lambda t: a * (-2 * np.cos(t) + 4 * np.cos(2 * t)),
+		lambda t: a * (-2 * np.sin(t) + 4 * np.sin(2 * t))
+	)
+
+def lissajousCurve(A, B, p, q, delta):
+	"""
+	The Lissajous curve (A sin(p t + delta), B sin(q t)), for integers `p` and `q` (so that it is closed).
+	"""
+	return Curve(
+		lambda t: A * np.sin(p * t + delta),
+		lambda t: B * np.sin(q * t),
+		lambda t: A * p * np.cos(p * t + delta),
+		lambda t: B * q * np.cos(q * t),
+		lambda t: -A * p ** 2 * np.sin(p * t + delta),
+		lambda t: -B * q ** 2 * np.sin(q * t)
+	)
+
+def stationarity(curve, t, px, py):
+	"""
+	Return g(t) = (x(t) - px) x'(t) + (y(t) - py) y'(t), half the derivative of the squared distance from (`px`, `py`) to the curve (the equivalent of dldtFunc), and its derivative.
+	"""
+	x, y, dx, dy = curve.x(t), curve.y(t), curve.dx(t), curve.dy(t)
+	g = (x - px) * dx + (y - py) * dy
+	dg = dx ** 2 + dy ** 2 + (x - px) * curve.ddx(t) + (y - py) * curve.ddy(t)
+	return g, dg
+
+def findFootPoints(curve, px, py, numGrid = 1024, maxIters = 60, tol = 1e-13, chunkSize = 4096, cuspTol = 1e-8):
+	"""
+	Find the parameters t of the feet of all the normals to `curve` which pass through each of the points (`px`, `py`).
+	The stationarity function g (see stationarity) is sampled on a shared grid of `numGrid` values of t for a chunk of points at once, every sign change is bracketed, and all the brackets are then polished together with Newton's method, falling back to bisection whenever a step would leave its bracket. Every simple root more than a grid spacing from its neighbours is found, so `numGrid` should be large enough to resolve the curve.
+	At a cusp (x' = y' = 0, as in cardioidCurve) g vanishes for every point without there being a normal, so roots where x'^2 + y'^2 is less than `cuspTol` times its largest value on the grid are discarded.
+	Returns the number of normals through each point, and an (N, max count) array of the roots in [0, 2*pi), padded with nan.
+	"""
+	px, py = np.broadcast_arrays(np.asarray(px, dtype = float).ravel(), np.asarray(py, dtype = float).ravel())
+	tGrid = np.linspace(0, 2 * np.pi, numGrid + 1)
+	pointIdx, roots = [], []
+
+	for start in range(0, len(px), chunkSize):
+		cpx, cpy = px[start:start + chunkSize, None], py[start:start + chunkSize, None]
+		g, _ = stationarity(curve, tGrid[None, :], cpx, cpy)
+
+		# Bracket every sign change (an exact zero at the left end of an interval counts as one)
+		signs = np.sign(g)
+		point, k = np.nonzero((signs[:, :-1] == 0) | (signs[:, :-1] * signs[:, 1:] < 0))
+		lo, hi = tGrid[k], tGrid[k + 1]
+		gLo = g[point, k]
+		cpxRoots, cpyRoots = cpx[point, 0], cpy[point, 0]
+
+		# Polish all the brackets together
+		t = lo.copy()
+		active = gLo != 0
+		t[active] = (lo[active] + hi[active]) / 2
+		for _ in range(maxIters):
+			if not np.any(active):
+				break
+			gt, dgt = stationarity(curve, t[active], cpxRoots[active], cpyRoots[active])
+			idx = np.flatnonzero(active)
+
+			# Shrink the brackets
+			sameSign = np.sign(gt) == np.sign(gLo[idx])
+			lo[idx[sameSign]], gLo[idx[sameSign]] = t[idx[sameSign]], gt[sameSign]
+			hi[idx[~sameSign]] = t[idx[~sameSign]]
+
+			# Take a Newton step if it stays inside the bracket, otherwise bisect
+			with np.errstate(divide = "ignore", invalid = "ignore"):
+				newton = t[idx] - gt / dgt
+			inside = np.isfinite(newton) & (newton > lo[idx]) & (newton < hi[idx])
+			newT = np.where(gt == 0, t[idx], np.where(inside, newton, (lo[idx] + hi[idx]) / 2))
+			active[idx] = (gt != 0) & (hi[idx] - lo[idx] > tol) & (np.abs(newT - t[idx]) > tol)
+			t[idx] = newT
+
+		pointIdx.append(point + start)
+		roots.append(t % (2 * np.pi))
+
+	pointIdx, roots = np.concatenate(pointIdx), np.concatenate(roots)
+	speed2 = lambda t: curve.dx(t) ** 2 + curve.dy(t) ** 2
+	regular = speed2(roots) >= cuspTol * np.max(speed2(tGrid))
+	pointIdx, roots = pointIdx[regular], roots[regular]
+	counts = np.bincount(pointIdx, minlength = len(px))
+
+	# Pad the roots of each point out into a rectangular array
+	padded = np.full([len(px), max(np.max(counts, initial = 0), 1)], np.nan)
+	order = np.lexsort((roots, pointIdx))
+	pointIdx, roots = pointIdx[order], roots[order]
+	slot = np.arange(len(pointIdx)) - np.searchsorted(pointIdx, pointIdx)
+	padded[pointIdx, slot] = roots
+	return counts, padded
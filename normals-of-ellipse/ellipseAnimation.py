@@ -1,4 +1,6 @@
 from ellipseLib import *
+import argparse
+import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
 a, b, = 2, 1
@@ -8,33 +10,23 @@ y1s = np.linspace(-b * scaleFactor, b * scaleFactor, 50)
 x1s = np.linspace(-a * scaleFactor, a * scaleFactor, 50)
 
 t = np.linspace(0, 2 * np.pi, 1000)
-allFrameThetas = [] # List of lists of angles of points to use
-points = np.zeros([x1s.size * y1s.size, 2]) # The points corresponding to the angles in allFrameThetas
-lFrames = np.zeros([x1s.size * y1s.size, t.size]) # The values of l to plot against t
-dldtFrames = np.zeros([x1s.size * y1s.size, t.size]) # The values of dl/dt to plot against t
 
-# Get solution for a grid of points
-frameNum = 0
-mult = 1 # This is just to make the animation look nicer
-for x1 in x1s:
-	mult *= -1
-	for y1 in y1s:
-		# Assume that any solutions which are the same to 5 d.p. are the same
-		sol = findAngles(a, b, x1, mult * y1)
-		sol = np.unique(np.round(sol, 5))
-		allFrameThetas.append(sol)
-		points[frameNum, :] = np.array([x1, mult * y1])
-
-		# Calculate l(t)
-		lFrames[frameNum, :] = lFunc(t, a, b, x1, mult * y1)
-
-		# Calculate dl(t)/dt
-		dldtFrames[frameNum, :] = dldtFullFunc(t, a, b, x1, mult * y1)[:]
-
-		frameNum += 1
-
-# Make the animation
-fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize = (7, 17))
-animation = FuncAnimation(fig, ellipseAnimationFrame, frames = len(allFrameThetas), interval = 5, repeat = True, fargs = (ax1, ax2, ax3, a, b, t, allFrameThetas, points, lFrames, dldtFrames))
-# animation.save("fullAnimation.gif", writer = "pillow", progress_callback = lambda i, n: print(f'Saving frame {i}/{n}'))
-plt.show()
\ No newline at end of file
+# Get the solutions, l(t) and dl(t)/dt for every point at once (assuming any solutions which are the same to 5 d.p. are the same)
+points = animationPoints(x1s, y1s)
+allFrameThetas, lFrames, dldtFrames = ellipseAnimationFrames(a, b, points, t, 5)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Animate the normals to an ellipse from a point moving around it.")
+	parser.add_argument("--export", default = None, help = "save the animation to this file (.gif, or any format ffmpeg can write) rather than showing it")
+	parser.add_argument("--fps", type = int, default = 30, help = "frames per second of the saved animation")
+	parser.add_argument("--workers", type = int, default = None, help = "number of worker processes rendering the saved frames")
+	args = parser.parse_args()
+
+	if args.export is not None:
+		exportAnimation(args.export, len(points), ellipseAnimationInit, (a, b, t, lFrames, dldtFrames), ellipseAnimationFrame, (allFrameThetas, points, lFrames, dldtFrames), figsize = (7, 17), fps = args.fps, numWorkers = args.workers)
+	else:
+		# Make the animation
+		fig = plt.figure(figsize = (7, 17))
+		artists = ellipseAnimationInit(fig, a, b, t, lFrames, dldtFrames)
+		animation = FuncAnimation(fig, ellipseAnimationFrame, frames = len(points), interval = 5, repeat = True, blit = True, fargs = (artists, allFrameThetas, points, lFrames, dldtFrames))
+		plt.show()
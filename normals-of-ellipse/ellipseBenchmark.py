@@ -0,0 +1,190 @@
+import numpy as np
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+def coldImportTime(module, repeats = 5):
+	"""
+	Return the shortest time (in s) taken to import `module` in a fresh interpreter, over `repeats` runs, less the time taken to start the interpreter.
+	"""
+	def bestTime(code):
+		times = []
+		for _ in range(repeats):
+			startTime = time.perf_counter()
+			subprocess.run([sys.executable, "-c", code], check = True, cwd = os.path.dirname(os.path.abspath(__file__)))
+			times.append(time.perf_counter() - startTime)
+		return min(times)
+
+	return bestTime(f"import {module}") - bestTime("pass")
+
+def benchmarkImport(maxTime = 0.5, repeats = 5):
+	"""
+	Check that importing ellipseLib in a fresh worker process takes no longer than `maxTime` seconds.
+	Returns the time taken.
+	"""
+	importTime = coldImportTime("ellipseLib", repeats)
+	print(f"Cold import of ellipseLib took {importTime:.3f}s")
+	assert importTime <= maxTime, f"Cold import of ellipseLib took {importTime:.3f}s (more than {maxTime}s)"
+	return importTime
+
+def solveFindAngles(a, b, X, Y):
+	"""
+	Solve each point with findAngles (fsolve from four seeds), as ellipseMain originally did.
+	"""
+	from ellipseLib import findAngles, encodeRootGaps
+
+	angles = np.sort([findAngles(a, b, x1, y1) for x1, y1 in zip(X, Y)], axis = 1)
+	return encodeRootGaps(angles, np.ones(angles.shape, dtype = bool))
+
+def solveFindAnglesBatch(a, b, X, Y, chunkSize = 65536):
+	"""
+	Solve the points in chunks with findAnglesBatch.
+	"""
+	from ellipseLib import findAnglesBatch, encodeRootGaps
+
+	return np.concatenate([encodeRootGaps(*findAnglesBatch(a, b, X[k:k + chunkSize], Y[k:k + chunkSize])) for k in range(0, len(X), chunkSize)])
+
+def solveFindFootPoints(a, b, X, Y):
+	"""
+	Solve the points with the curve-agnostic findFootPoints.
+	"""
+	from curveLib import findFootPoints, ellipseCurve
+	from ellipseLib import encodeRootGaps
+
+	_, roots = findFootPoints(ellipseCurve(a, b), X, Y)
+	roots = np.pad(roots, [(0, 0), (0, max(0, 4 - roots.shape[1]))], constant_values = np.nan)[:, :4]
+	return encodeRootGaps(roots, ~np.isnan(roots))
+
+solvers = {"findAngles": solveFindAngles, "findAnglesBatch": solveFindAnglesBatch, "findFootPoints": solveFindFootPoints}
+"""
+The solvers which can be benchmarked, each taking (a, b, X, Y) and returning root gap codes (see ellipseLib.encodeRootGaps). New solvers should be added here.
+"""
+
+def gridPoints(a, b, size):
+	"""
+	Return the points of the standard `size` by `size` quadrant grid, as in ellipseMain.
+	"""
+	X, Y = np.meshgrid(np.linspace(0, a * 1.1, size), np.linspace(0, b * 5, size))
+	return X.ravel(), Y.ravel()
+
+def evolutePoints(a, b, num, seed = 0):
+	"""
+	Return `num` points clustered around the evolute in the first quadrant, at relative distances from it between 1e-12 and 1e-2 on either side.
+	"""
+	rng = np.random.default_rng(seed)
+	t = rng.uniform(0, np.pi / 2, num)
+	scale = 1 + rng.choice([-1, 1], num) * 10 ** rng.uniform(-12, -2, num)
+	return scale * (a ** 2 - b ** 2) / a * np.cos(t) ** 3, scale * (a ** 2 - b ** 2) / b * np.sin(t) ** 3
+
+def referenceCounts(a, b, X, Y, dps = 50):
+	"""
+	Find the exact number of normals through each point by comparing (a x)^(2/3) + (b y)^(2/3) with |a^2 - b^2|^(2/3) to `dps` digits with mpmath.
+	"""
+	import mpmath
+
+	with mpmath.workdps(dps):
+		rhs = mpmath.cbrt(mpmath.mpf(a) ** 2 - mpmath.mpf(b) ** 2) ** 2
+		lhs = [mpmath.cbrt(abs(mpmath.mpf(a) * mpmath.mpf(x1))) ** 2 + mpmath.cbrt(abs(mpmath.mpf(b) * mpmath.mpf(y1))) ** 2 for x1, y1 in zip(X, Y)]
+		return np.array([4 if l < rhs else 2 if l > rhs else 3 for l in lhs])
+
+def runCase(solverName, a, b, X, Y):
+	"""
+	Time a solver on the points (`X`, `Y`). Run in a fresh process so that the peak RSS is its own.
+	"""
+	startTime = time.perf_counter()
+	gapCodes = solvers[solverName](a, b, X, Y)
+	seconds = time.perf_counter() - startTime
+	return gapCodes, {"points": len(X), "seconds": seconds, "pointsPerSecond": len(X) / seconds, "peakRssMB": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+def runIsolated(fn, *args):
+	"""
+	Run `fn` with `args` in a freshly spawned process, returning its result.
+	"""
+	with multiprocessing.get_context("spawn").Pool(1) as pool:
+		return pool.apply(fn, args)
+
+def benchmarkSolvers(sizes, ratios, solverNames, maxPoints, evoluteNum, precs, seed = 0):
+	"""
+	Benchmark each solver on the standard quadrant grid of each size and on points clustered around the evolute, for ellipses with each a / b ratio (b = 1). Grids with more than `maxPoints[solver]` points are randomly subsampled for that solver.
+	The counts are checked against referenceCounts on the evolute points (and a random sample of each grid), and the disagreement rate is found for each precision in `precs`.
+	"""
+	from ellipseLib import countsAtPrecision
+
+	rng = np.random.default_rng(seed)
+	results = []
+
+	for ratio in ratios:
+		a, b = ratio, 1
+		cases = [(f"grid{size}", *gridPoints(a, b, size)) for size in sizes] + [("evolute", *evolutePoints(a, b, evoluteNum, seed))]
+
+		for caseName, X, Y in cases:
+			checkIdx = rng.choice(len(X), min(len(X), evoluteNum), replace = False)
+			reference = referenceCounts(a, b, X[checkIdx], Y[checkIdx])
+
+			for solverName in solverNames:
+				idx = np.arange(len(X)) if len(X) <= maxPoints[solverName] else np.sort(rng.choice(len(X), maxPoints[solverName], replace = False))
+				gapCodes, result = runIsolated(runCase, solverName, a, b, X[idx], Y[idx])
+
+				# Check the counts on the points which were both solved and have a reference
+				solved = np.isin(checkIdx, idx)
+				gapCodes = gapCodes[np.searchsorted(idx, checkIdx[solved])]
+				result["disagreement"] = {str(prec): float(np.mean(countsAtPrecision(gapCodes, prec) != reference[solved])) for prec in precs}
+
+				result.update({"solver": solverName, "case": caseName, "a": a, "b": b, "gridPoints": len(X), "subsampled": len(idx) < len(X)})
+				results.append(result)
+				print(f"{solverName} a/b={ratio} {caseName}: {result['pointsPerSecond']:.0f} points/s, {result['peakRssMB']:.0f}MB, disagreement {result['disagreement']}")
+
+	return results
+
+def benchmarkScaling(size, workerCounts, a = 2, b = 1):
+	"""
+	Time ellipseGrid.computeGrid on the standard `size` by `size` grid for each number of workers in `workerCounts`.
+	"""
+	from ellipseGrid import computeGrid
+
+	x1s, y1s = np.linspace(0, a * 1.1, size), np.linspace(0, b * 5, size)
+	results = []
+	for numWorkers in workerCounts:
+		startTime = time.perf_counter()
+		computeGrid(a, b, x1s, y1s, numWorkers, verbose = False)
+		seconds = time.perf_counter() - startTime
+
+		results.append({"workers": numWorkers, "points": size ** 2, "seconds": seconds, "pointsPerSecond": size ** 2 / seconds})
+		print(f"{numWorkers} workers: {size ** 2 / seconds:.0f} points/s")
+	return results
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Benchmark the speed and accuracy of the normals solvers, writing the results as JSON.")
+	parser.add_argument("--output", default = "benchmark.json", help = "file to write the results to")
+	parser.add_argument("--sizes", type = int, nargs = "+", default = [100, 500, 1000, 2000, 4000], help = "side lengths of the quadrant grids")
+	parser.add_argument("--ratios", type = float, nargs = "+", default = [2, 1.25, 5], help = "a / b ratios of the ellipses")
+	parser.add_argument("--solvers", nargs = "+", default = list(solvers), choices = list(solvers))
+	parser.add_argument("--max-points", type = int, default = 20000, help = "number of points to subsample grids to for findAngles and findFootPoints")
+	parser.add_argument("--evolute-points", type = int, default = 2000, help = "number of points around the evolute (and checked against the reference)")
+	parser.add_argument("--precs", type = float, nargs = "+", default = [3, 5, 7, 9], help = "precisions (d.p.) to check the counts at")
+	parser.add_argument("--max-import-time", type = float, default = 0.5, help = "longest a cold import of ellipseLib may take (seconds) before the benchmark fails")
+	parser.add_argument("--scaling-size", type = int, default = 1000, help = "grid size for the worker scaling benchmark")
+	args = parser.parse_args()
+
+	maxPoints = {name: args.max_points for name in solvers}
+	maxPoints["findAnglesBatch"] = max(args.sizes) ** 2
+	workerCounts = sorted({2 ** k for k in range(int(np.log2(os.cpu_count())) + 1)} | {os.cpu_count()})
+
+	results = {
+		"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"machine": {"platform": platform.platform(), "python": platform.python_version(), "numpy": np.__version__, "cpus": os.cpu_count()},
+		"coldImportSeconds": benchmarkImport(args.max_import_time),
+		"maxImportSeconds": args.max_import_time,
+		"solvers": benchmarkSolvers(args.sizes, args.ratios, args.solvers, maxPoints, args.evolute_points, args.precs),
+		"scaling": benchmarkScaling(args.scaling_size, workerCounts)
+	}
+
+	with open(args.output, "w") as f:
+		json.dump(results, f, indent = 1)
+	print(f"Results saved to {args.output}")
@@ -0,0 +1,238 @@
+import numpy as np
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool, shared_memory
+from ellipseLib import findAnglesBatch, encodeRootGaps, countsAtPrecision
+from diskCache import loadEntry, saveEntry, evictCache
+
+def tileEdges(n, tileLen, offset = 0):
+	"""
+	Return the edges of the tiles along an axis of length `n`, every `tileLen` points with the first tile `offset` points short.
+	"""
+	return np.unique(np.clip(np.arange(-offset, n + tileLen, tileLen), 0, n))
+
+def tileOffset(xs, tileLen):
+	"""
+	Return the offset (see tileEdges) which puts the tile edges of the uniformly spaced `xs` on multiples of `tileLen` grid spacings from 0, so that grids with the same spacing but different framing share the same tiles (and so the same cache entries). Returns 0 if `xs` isn't uniformly spaced.
+	"""
+	if len(xs) < 2:
+		return 0
+	dx = (xs[-1] - xs[0]) / (len(xs) - 1)
+	if dx <= 0 or not np.allclose(np.diff(xs), dx, rtol = 1e-9, atol = 0):
+		return 0
+	return int(np.round(xs[0] / dx)) % tileLen
+
+def makeTiles(ny, nx, tileShape, offset = (0, 0)):
+	"""
+	Split an `ny` by `nx` grid into tiles of (at most) `tileShape`, covering every row and column, with the tile edges shifted by `offset` (see tileEdges).
+	Returns a list of (startI, endI, startJ, endJ) for each tile, in the same (row-major) order as the completion bitmap of a grid file.
+	"""
+	rowEdges, colEdges = tileEdges(ny, tileShape[0], offset[0]), tileEdges(nx, tileShape[1], offset[1])
+	return [(int(startI), int(endI), int(startJ), int(endJ)) for startI, endI in zip(rowEdges[:-1], rowEdges[1:]) for startJ, endJ in zip(colEdges[:-1], colEdges[1:])]
+
+def solveTile(a, b, x1s, y1s):
+	"""
+	Find the normals through every point of the grid `x1s` by `y1s`.
+	Returns a (len(y1s), len(x1s), 4) array of root gap codes, from which the number of normals at any precision can be found with countsAtPrecision.
+	"""
+	return encodeRootGaps(*findAnglesBatch(a, b, x1s[None, :], y1s[:, None]))
+
+solverVersion = 1
+"""
+Version of solveTile, which is part of the key of every cached tile. It must be bumped whenever a change to the solver changes its results, so that stale tiles are never reused.
+"""
+
+def tileKey(a, b, x1s, y1s):
+	"""
+	Return the cache key of the tile `x1s` by `y1s` for the ellipse with semi-axes `a` and `b`.
+	The root gap codes only depend on the angles of the feet of the normals, which don't change when the ellipse and the points are scaled together, so the key is a hash of the solver version, b / a and the points divided by a (rounded to 9 d.p., so that the same points from differently framed grids match). Rescaled runs therefore share tiles.
+	"""
+	key = hashlib.sha256()
+	key.update(np.array([solverVersion, len(x1s), len(y1s)]).tobytes())
+	for value in (np.asarray([b / a]), np.asarray(x1s) / a, np.asarray(y1s) / a):
+		key.update((np.round(value.astype(float), 9) + 0.0).tobytes()) # + 0.0 turns -0.0 into 0.0
+	return key.hexdigest()
+
+def cachedSolveTile(a, b, x1s, y1s, cacheDir):
+	"""
+	Like solveTile, but reading the tile from (or writing it to) the cache directory `cacheDir`, in which each tile is a .npy file named by its tileKey (see diskCache, whose evictCache removes the least recently used ones).
+	Returns the root gap codes and whether they came from the cache.
+	"""
+	key = tileKey(a, b, x1s, y1s)
+	gapCodes = loadEntry(cacheDir, key, ".npy", np.load)
+	if gapCodes is not None:
+		return gapCodes, True
+	gapCodes = solveTile(a, b, x1s, y1s)
+	saveEntry(cacheDir, key, ".npy", lambda f: np.save(f, gapCodes))
+	return gapCodes, False
+
+# The output array of the pool (and the shared memory behind it, if it isn't a file), attached to once by each worker process, and the tile cache directory (if any)
+workerShm = None
+workerOut = None
+workerCacheDir = None
+
+def initWorker(path, shmName, shape, dtype, cacheDir = None):
+	"""
+	Attach a pool worker to the output, which is either the memory-mapped file `path` or the shared memory `shmName`, and to the tile cache `cacheDir`.
+	"""
+	global workerOut, workerShm, workerCacheDir
+	workerCacheDir = cacheDir
+	if path is not None:
+		workerOut = np.load(path, mmap_mode = "r+")
+	else:
+		workerShm = shared_memory.SharedMemory(name = shmName)
+		workerOut = np.ndarray(shape, dtype = dtype, buffer = workerShm.buf)
+
+def workerFn(args):
+	"""
+	Function which is executed in a worker process. Each call solves one tile (or reads it from the cache) and writes it straight into the shared output (flushing it to disk if the output is a file).
+	"""
+	a, b, x1s, y1s, k, (startI, endI, startJ, endJ) = args
+	if workerCacheDir is None:
+		gapCodes, cached = solveTile(a, b, x1s, y1s), False
+	else:
+		gapCodes, cached = cachedSolveTile(a, b, x1s, y1s, workerCacheDir)
+
+	workerOut[startI:endI, startJ:endJ, :] = gapCodes
+	if isinstance(workerOut, np.memmap):
+		workerOut.flush()
+	return k, (endI - startI) * (endJ - startJ), cached
+
+def runTiles(a, b, x1s, y1s, tiles, todo, numWorkers, initargs, onDone, verbose = True):
+	"""
+	Solve the tiles with indices in `todo` among `numWorkers` processes, calling `onDone` with the index of each tile once it has been written to the output (and printing the progress if `verbose`).
+	"""
+	startTime = time.time()
+	numDone = 0
+	numCached = 0
+
+	with Pool(numWorkers, initializer = initWorker, initargs = initargs) as pool:
+		args = [(a, b, x1s[tiles[k][2]:tiles[k][3]], y1s[tiles[k][0]:tiles[k][1]], k, tiles[k]) for k in todo]
+		for n, (k, numPoints, cached) in enumerate(pool.imap_unordered(workerFn, args)):
+			numDone += numPoints
+			numCached += cached
+			if verbose: print(f"{n + 1}/{len(todo)} tiles ({numCached} from the cache), {numDone / (time.time() - startTime):.0f} points/s")
+			onDone(k)
+
+def computeGrid(a, b, x1s, y1s, numWorkers = None, tileShape = (256, 256), verbose = True, cacheDir = None, cacheBytes = 2 ** 30):
+	"""
+	Find the normals through every point of the grid `x1s` by `y1s`, splitting the grid into tiles which are shared among `numWorkers` processes (all cores by default).
+	If `cacheDir` is given, tiles are read from and saved to the tile cache there (see cachedSolveTile), which is then trimmed to `cacheBytes`.
+	Returns a (len(y1s), len(x1s), 4) array of root gap codes. Use createGridFile and computeGridFile instead to keep (and be able to resume) the result on disk.
+	"""
+	shape = (len(y1s), len(x1s), 4)
+	dtype = np.dtype(np.uint8)
+	shm = shared_memory.SharedMemory(create = True, size = int(np.prod(shape)) * dtype.itemsize)
+
+	try:
+		numSols = np.ndarray(shape, dtype = dtype, buffer = shm.buf)
+		numSols[:] = 0
+
+		tiles = makeTiles(shape[0], shape[1], tileShape, (tileOffset(y1s, tileShape[0]), tileOffset(x1s, tileShape[1])))
+		runTiles(a, b, x1s, y1s, tiles, range(len(tiles)), numWorkers, (None, shm.name, shape, dtype, cacheDir), lambda k: None, verbose)
+		return numSols.copy()
+	finally:
+		shm.close()
+		shm.unlink()
+		if cacheDir is not None:
+			evictCache(cacheDir, cacheBytes, ".npy")
+
+def createGridFile(filename, a, b, x1s, y1s, tileShape = (256, 256)):
+	"""
+	Set up the files for computing the grid `x1s` by `y1s` on disk:
+		`filename`.npy - the (len(y1s), len(x1s), 4) uint8 root gap codes, memory-mapped as it is filled in
+		`filename`.tiles.npy - the completion bitmap, with one entry per tile
+		`filename`.json - everything else needed to resume the computation
+	"""
+	np.lib.format.open_memmap(f"{filename}.npy", mode = "w+", dtype = np.uint8, shape = (len(y1s), len(x1s), 4)).flush()
+	offset = (tileOffset(y1s, tileShape[0]), tileOffset(x1s, tileShape[1]))
+	numTiles = (len(tileEdges(len(y1s), tileShape[0], offset[0])) - 1, len(tileEdges(len(x1s), tileShape[1], offset[1])) - 1)
+	np.save(f"{filename}.tiles.npy", np.zeros(numTiles, dtype = bool))
+
+	with open(f"{filename}.json", "w") as f:
+		json.dump({"a": a, "b": b, "x1s": list(map(float, x1s)), "y1s": list(map(float, y1s)), "tileShape": list(tileShape), "tileOffset": list(offset)}, f)
+
+def computeGridFile(filename, numWorkers = None, saveFreq = 100, cacheDir = None, cacheBytes = 2 ** 30):
+	"""
+	Compute (or carry on computing) the grid set up by createGridFile, only solving the tiles which aren't marked as done in the completion bitmap (using the tile cache in `cacheDir`, if given, as in computeGrid).
+	The bitmap is flushed to disk every `saveFreq` tiles. A tile is only marked as done once its output has been flushed, so a killed run can always be resumed from where it stopped.
+	Returns the output, memory-mapped.
+	"""
+	with open(f"{filename}.json") as f:
+		meta = json.load(f)
+	x1s, y1s = np.array(meta["x1s"]), np.array(meta["y1s"])
+
+	done = np.load(f"{filename}.tiles.npy", mmap_mode = "r+")
+	tiles = makeTiles(len(y1s), len(x1s), meta["tileShape"], meta.get("tileOffset", (0, 0)))
+	todo = np.flatnonzero(~done.ravel())
+	print(f"{len(tiles) - len(todo)}/{len(tiles)} tiles already done")
+
+	numDone = len(tiles) - len(todo)
+	def onDone(k):
+		nonlocal numDone
+		done.flat[k] = True
+		numDone += 1
+		if numDone % saveFreq == 0:
+			done.flush()
+
+	try:
+		runTiles(meta["a"], meta["b"], x1s, y1s, tiles, todo, numWorkers, (f"{filename}.npy", None, None, None, cacheDir), onDone)
+	finally:
+		done.flush()
+		if cacheDir is not None:
+			evictCache(cacheDir, cacheBytes, ".npy")
+
+	return np.load(f"{filename}.npy", mmap_mode = "r")
+
+def adaptiveGrid(a, b, x1s, y1s, prec, tileShape = (256, 256), minTile = 8, numSamples = 4, out = None, seed = 0):
+	"""
+	Find the normals through every point of the grid `x1s` by `y1s` by quadtree refinement, rather than solving at every point.
+	Starting from tiles of `tileShape`, the corners, centre and `numSamples` random points of every tile are solved (all the tiles at each level of the tree together). If they all have the same number of normals (to `prec` d.p.) the whole tile is given the root gap codes of its centre, otherwise it is split into four. The grid can then be read at other precisions with countsAtPrecision as well, but the tiles were only checked to be uniform at `prec`, so at lower precisions (where more points near the evolute have roots which count as the same) a filled tile shows the count at its centre throughout. Tiles no bigger than `minTile` along either side are solved at every point.
+	The result is the same (len(y1s), len(x1s), 4) array of root gap codes as from computeGrid (written into `out` if given, e.g. a memmap for very large grids), so the solving time goes with the length of the evolute rather than the area of the grid. Features smaller than the initial tiles which none of the samples land on can be missed.
+	Returns the root gap codes and the number of points which were solved.
+	"""
+	rng = np.random.default_rng(seed)
+	if out is None:
+		out = np.zeros((len(y1s), len(x1s), 4), dtype = np.uint8)
+
+	tiles = np.array(makeTiles(len(y1s), len(x1s), tileShape))
+	numSolved = 0
+
+	while len(tiles) > 0:
+		small = np.minimum(tiles[:, 1] - tiles[:, 0], tiles[:, 3] - tiles[:, 2]) <= minTile
+
+		# Solve the small tiles at every point
+		for startI, endI, startJ, endJ in tiles[small]:
+			out[startI:endI, startJ:endJ] = solveTile(a, b, x1s[startJ:endJ], y1s[startI:endI])
+			numSolved += (endI - startI) * (endJ - startJ)
+
+		# Sample the rest
+		tiles = tiles[~small]
+		if len(tiles) == 0:
+			break
+
+		startI, endI, startJ, endJ = [tiles[:, [k]] for k in range(4)]
+		sampleI = np.hstack([startI, startI, endI - 1, endI - 1, (startI + endI) // 2, rng.integers(startI, endI, (len(tiles), numSamples))])
+		sampleJ = np.hstack([startJ, endJ - 1, startJ, endJ - 1, (startJ + endJ) // 2, rng.integers(startJ, endJ, (len(tiles), numSamples))])
+		gapCodes = encodeRootGaps(*findAnglesBatch(a, b, x1s[sampleJ], y1s[sampleI]))
+		counts = countsAtPrecision(gapCodes, prec)
+		numSolved += counts.size
+
+		# Fill in the tiles where all the samples agree with the root gaps found at their centre (sample 4), so that they can be read at other precisions as well
+		agree = np.all(counts == counts[:, [0]], axis = 1)
+		for (startI, endI, startJ, endJ), codes in zip(tiles[agree], gapCodes[agree, 4]):
+			out[startI:endI, startJ:endJ] = codes
+
+		# Split the others into four
+		tiles = tiles[~agree]
+		midI, midJ = (tiles[:, 0] + tiles[:, 1]) // 2, (tiles[:, 2] + tiles[:, 3]) // 2
+		tiles = np.concatenate([
+			np.stack([tiles[:, 0], midI, tiles[:, 2], midJ], axis = 1),
+			np.stack([tiles[:, 0], midI, midJ, tiles[:, 3]], axis = 1),
+			np.stack([midI, tiles[:, 1], tiles[:, 2], midJ], axis = 1),
+			np.stack([midI, tiles[:, 1], midJ, tiles[:, 3]], axis = 1)
+		])
+
+	return out, numSolved
@@ -1,7 +1,4 @@
 import numpy as np
-from scipy.optimize import fsolve
-import matplotlib.pyplot as plt
-import sympy as sy
 
 def lFunc(t, a, b, x1, y1):
 	"""
@@ -15,23 +12,144 @@ def dldtFunc(x, a, b, x1, y1):
 	"""
 	return (a * (x1 - a * np.cos(x)) * np.sin(x) - b * (y1 - b * np.sin(x)) * np.cos(x))
 
-xSym = sy.symbols("x", real = True, domain = sy.Interval(0, 2 * sy.pi))
-aSym, bSym = sy.symbols("a, b", nonzero = True)
-x1Sym, y1Sym = sy.symbols("x1, y1", real = True)
-l = sy.sqrt((x1Sym - aSym * sy.cos(xSym)) ** 2 + (y1Sym - bSym * sy.sin(xSym))**2)
-dldtFullFunc = sy.lambdify((xSym, aSym, bSym, x1Sym, y1Sym), sy.diff(l, xSym), "numpy")
-"""
-The analytical first derivative of l w.r.t. t, made using sympy. Used in the animation.
-"""
+def dldtFullFunc(x, a, b, x1, y1):
+	"""
+	Return the analytical first derivative of l w.r.t. t (which is dldtFunc / l). Used in the animation.
+	"""
+	return dldtFunc(x, a, b, x1, y1) / lFunc(x, a, b, x1, y1)
 
 def findAngles(a, b, x1, y1):
 	"""
 	Numerically find the azimuthal angles of the points on the ellipse such that the normal passing through that point also passes through (`x1`, `y1`)
 	Returns four solutions within the interval [0,2*pi).
 	"""
+	from scipy.optimize import fsolve # Only imported when needed, since it is slow to import and findAnglesBatch doesn't need it
+
 	sol = fsolve(dldtFunc, [0, np.pi / 2, np.pi, np.pi * 3 / 2], (a, b, x1, y1))
 	return sol % (2 * np.pi)
 
+def findAnglesBatch(a, b, x1s, y1s, tol = 1e-6, newtonIters = 2):
+	"""
+	Find the azimuthal angles of the feet of all the normals through every point (`x1s`, `y1s`) at once (the two are broadcast against each other). `a` must not equal `b`, otherwise a ValueError is raised, since a circle has two normals through every point other than its centre and infinitely many through that.
+	Writing z = exp(it), the stationarity condition dldtFunc = 0 becomes the quartic
+		-(a^2 - b^2) z^4 + 2(a x1 - i b y1) z^3 - 2(a x1 + i b y1) z + (a^2 - b^2) = 0
+	whose roots on the unit circle are exactly the real angles. All the quartics are solved together with batched companion matrix eigenvalues, then polished with a few Newton steps on dldtFunc.
+	Returns `angles`, an (..., 4) array of angles in [0, 2*pi) sorted along the last axis (nan where there is no root), and `valid`, the mask of the real roots.
+	"""
+	if a == b:
+		# The quartic is divided through by a^2 - b^2, and every normal to a circle goes through its centre anyway
+		raise ValueError("a must not equal b: the normals to a circle are just the lines through its centre")
+	x1s, y1s = np.broadcast_arrays(np.asarray(x1s, dtype = float), np.asarray(y1s, dtype = float))
+	shape = x1s.shape
+	A, B, C = a * x1s.ravel(), b * y1s.ravel(), a ** 2 - b ** 2
+
+	# Companion matrices of the monic quartics z^4 + c3 z^3 + c2 z^2 + c1 z + c0 (c2 is always 0)
+	companion = np.zeros([A.size, 4, 4], dtype = complex)
+	companion[:, 1, 0] = companion[:, 2, 1] = companion[:, 3, 2] = 1
+	companion[:, 0, 3] = 1 # c0 = -1
+	companion[:, 0, 2] = -2 * (A + 1j * B) / C # -c1
+	companion[:, 0, 0] = 2 * (A - 1j * B) / C # -c3
+	z = np.linalg.eigvals(companion)
+
+	# Only the roots on the unit circle correspond to real angles
+	valid = np.abs(np.abs(z) - 1) < tol
+	angles = np.angle(z)
+
+	# Polish the real roots against the original equation
+	for _ in range(newtonIters):
+		cos, sin = np.cos(angles), np.sin(angles)
+		f = A[:, None] * sin - B[:, None] * cos - C * sin * cos
+		dfdt = A[:, None] * cos + B[:, None] * sin - C * (cos ** 2 - sin ** 2)
+		step = np.divide(f, dfdt, out = np.zeros_like(f), where = dfdt != 0)
+		angles = angles - np.where(valid, step, 0)
+
+	angles = np.where(valid, angles % (2 * np.pi), np.nan)
+	order = np.argsort(angles, axis = 1) # nan sorts last
+	angles = np.take_along_axis(angles, order, axis = 1)
+	valid = np.take_along_axis(valid, order, axis = 1)
+	return angles.reshape(shape + (4,)), valid.reshape(shape + (4,))
+
+def distinctAngles(angles, valid, prec):
+	"""
+	Round the angles from findAnglesBatch to `prec` d.p., assuming any which are then the same are the same solution.
+	Returns the sorted distinct angles along the last axis, padded with nan.
+	"""
+	rounded = np.sort(np.where(valid, np.round(angles, prec), np.nan), axis = -1)
+	rounded[..., 1:][rounded[..., 1:] == rounded[..., :-1]] = np.nan
+	rounded = np.sort(rounded, axis = -1)
+
+	# Angles either side of 0 / 2 pi are the same solution too
+	last = np.maximum(np.sum(~np.isnan(rounded), axis = -1, keepdims = True) - 1, 0)
+	wraps = (last > 0) & (np.take_along_axis(rounded, last, axis = -1) == np.round(rounded[..., :1] + 2 * np.pi, prec))
+	np.put_along_axis(rounded, last, np.where(wraps, np.nan, np.take_along_axis(rounded, last, axis = -1)), axis = -1)
+	return rounded
+
+def countDistinct(angles, valid, prec):
+	"""
+	Count the number of distinct angles in each row of `angles` (as returned by findAnglesBatch), assuming any which are the same to `prec` d.p. are the same, as in ellipseMain.
+	"""
+	return np.sum(~np.isnan(distinctAngles(angles, valid, prec)), axis = -1)
+
+gapSteps = 16
+"""
+The number of root gap codes per decimal place (see encodeRootGaps).
+"""
+noRoot = 255
+"""
+The root gap code used where there is no root.
+"""
+
+def encodeRootGaps(angles, valid):
+	"""
+	Compactly store the solutions from findAnglesBatch, so that the number of distinct solutions can be found later for any precision (see countsAtPrecision).
+	For each root, the gap to the next root round the ellipse is stored as the uint8 code ceil(gapSteps * -log10(gap)), clipped to [0, noRoot - 1], with noRoot for the missing roots.
+	"""
+	k = np.sum(valid, axis = -1, keepdims = True)
+	idx = np.arange(angles.shape[-1])
+	wraps = idx + 1 >= k
+	nextAngles = np.take_along_axis(angles, np.where(wraps, 0, idx + 1), axis = -1)
+	gaps = nextAngles - angles + np.where(wraps, 2 * np.pi, 0)
+
+	with np.errstate(divide = "ignore", invalid = "ignore"):
+		codes = np.clip(np.ceil(-gapSteps * np.log10(gaps)), 0, noRoot - 1)
+	return np.where(idx < k, codes, noRoot).astype(np.uint8)
+
+def countsAtPrecision(gapCodes, p):
+	"""
+	Find the number of distinct solutions for each point from the codes made by encodeRootGaps, with two solutions being the same if they are closer than 10^-`p` (this is exact when `p` is a multiple of 1/gapSteps).
+	"""
+	distinct = np.sum(gapCodes <= gapSteps * p, axis = -1)
+	anyRoots = gapCodes[..., 0] != noRoot
+	return np.where(anyRoots, np.maximum(distinct, 1), 0).astype(np.uint8)
+
+def countsToRootGaps(counts, numRoots = 4):
+	"""
+	Make root gap codes for points with `counts` well separated solutions, e.g. from analyticNormalCount.
+	"""
+	return np.where(np.arange(numRoots) < counts[..., None], 0, noRoot).astype(np.uint8)
+
+def analyticNormalCount(a, b, X, Y, tol = 1e-3):
+	"""
+	Find the number of normals through every point (`X`, `Y`) without solving anything, using which side of the evolute (a x)^(2/3) + (b y)^(2/3) = |a^2 - b^2|^(2/3) the point is on: 4 inside, 2 outside and 3 on it.
+	Returns the counts, and a mask of the points within a relative distance `tol` of the evolute, where the classification shouldn't be trusted (see validateNormalCount).
+	"""
+	lhs = np.abs(a * X) ** (2 / 3) + np.abs(b * Y) ** (2 / 3)
+	rhs = np.abs(a ** 2 - b ** 2) ** (2 / 3)
+
+	counts = np.where(lhs < rhs, 4, 2).astype(np.uint8)
+	counts[lhs == rhs] = 3
+	band = np.abs(lhs - rhs) <= tol * rhs
+	return counts, band
+
+def validateNormalCount(a, b, X, Y, counts, band):
+	"""
+	Make root gap codes (see encodeRootGaps) for every point (`X`, `Y`), using the counts from analyticNormalCount outside `band` and solving numerically with findAnglesBatch inside it.
+	"""
+	X, Y = np.broadcast_arrays(X, Y)
+	gapCodes = countsToRootGaps(counts)
+	gapCodes[band] = encodeRootGaps(*findAnglesBatch(a, b, X[band], Y[band]))
+	return gapCodes
+
 def plotNormals(thetas, a, b, x1, y1, ax):
 	"""
 	Plot all the lines which go between (`x1`, `y1`) and each of the points on the ellipse with azimuthal angle in `thetas`, on axes `ax`
@@ -52,28 +170,51 @@ def plotNormals(thetas, a, b, x1, y1, ax):
 	ax.set_xlim(-a * 1.6, a * 1.6)
 	ax.set_ylim(-a * 1.6, a * 1.6)
 
-def ellipseAnimationFrame(iframe, ax1, ax2, ax3, a, b, t, allFrameThetas, points, lFrames, dldtFrames):
+def animationPoints(x1s, y1s):
+	"""
+	Return the points visited by the animations, going up and down the columns of the grid `x1s` by `y1s` in turn (this is just to make the animation look nicer).
+	"""
+	mult = -(-1) ** np.arange(len(x1s))
+	return np.stack([np.repeat(x1s, len(y1s)), (mult[:, None] * y1s[None, :]).ravel()], axis = 1)
+
+def ellipseAnimationFrames(a, b, points, t, prec = 5):
 	"""
-	Function to be passed to FuncAnimation which handles drawing individual frames.
+	Precompute everything drawn in the frames of the ellipse animation for all of `points` at once: the angles of the normals (assuming any solutions which are the same to `prec` d.p. are the same, padded with nan), and l(t) and dl/dt against `t`.
 	"""
-	ax1.cla()
-	plotNormals(allFrameThetas[iframe], a, b, points[iframe, 0], points[iframe, 1], ax1)
+	allFrameThetas = distinctAngles(*findAnglesBatch(a, b, points[:, 0], points[:, 1]), prec)
+	lFrames = lFunc(t[None, :], a, b, points[:, [0]], points[:, [1]])
+	dldtFrames = dldtFullFunc(t[None, :], a, b, points[:, [0]], points[:, [1]])
+	return allFrameThetas, lFrames, dldtFrames
 
-	# For setting limits
-	lMin, lMax = np.min(lFrames), np.max(lFrames)
-	dldtMin, dldtMax = np.min(dldtFrames), np.max(dldtFrames)
+def ellipseAnimationInit(fig, a, b, t, lFrames, dldtFrames):
+	"""
+	Set up the axes of the ellipse animation on `fig`, with their limits (found once, from all the frames) and the artists which ellipseAnimationFrame updates.
+	Returns the artists.
+	"""
+	ax1, ax2, ax3 = fig.subplots(3, 1)
+
+	# For setting limits (dl/dt is nan where the point is on the ellipse)
+	lMin, lMax = np.nanmin(lFrames), np.nanmax(lFrames)
+	dldtMin, dldtMax = np.nanmin(dldtFrames), np.nanmax(dldtFrames)
 
-	ax2.cla()
-	ax2.plot(t, lFrames[iframe])
+	# The ellipse, point, normals and the points they meet the ellipse
+	ellipseT = np.linspace(0, 2 * np.pi, 1000)
+	ax1.plot(a * np.cos(ellipseT), b * np.sin(ellipseT))
+	point, = ax1.plot([], [], "o")
+	normals = [ax1.plot([], [])[0] for _ in range(4)]
+	feet = [ax1.plot([], [], "x", color = normal.get_color())[0] for normal in normals]
+	ax1.set_xlim(-a * 1.6, a * 1.6)
+	ax1.set_ylim(-a * 1.6, a * 1.6)
+
+	lLine, = ax2.plot(t, lFrames[0])
 	ax2.grid(visible = True)
-	ax2.vlines(allFrameThetas[iframe], lMin - 5, lMax + 5, "r")
+	lVlines = ax2.vlines([], lMin - 5, lMax + 5, "r")
 	ax2.set_xlim(np.min(t) - 0.1, np.max(t) + 0.1)
 	ax2.set_ylim(lMin * 1.1, lMax * 1.1)
 
-	ax3.cla()
-	ax3.plot(t, dldtFrames[iframe])
+	dldtLine, = ax3.plot(t, dldtFrames[0])
 	ax3.grid(visible = True)
-	ax3.vlines(allFrameThetas[iframe], dldtMin - 5, dldtMax + 5, "r")
+	dldtVlines = ax3.vlines([], dldtMin - 5, dldtMax + 5, "r")
 	ax3.hlines(0, -1, 10, "k")
 	ax3.set_xlim(np.min(t) - 0.1, np.max(t) + 0.1)
 	ax3.set_ylim(dldtMin * 1.1, dldtMax * 1.1)
@@ -86,15 +227,134 @@ def ellipseAnimationFrame(iframe, ax1, ax2, ax3, a, b, t, allFrameThetas, points
 	ax3.set_xlabel("$t$")
 	ax3.set_ylabel(r"$\dfrac{dl}{dt}$")
 
-def showBig(numSols, x1Len = 10000, y1Len = 10000, deltax1 = 0.00022002200220022004, deltay1 =0.0005000500050005, a = 2, b = 1, showEllipse = True, showEvolute = True, showIm = True, saveIm = False, dpi = 400):
+	return {"a": a, "b": b, "point": point, "normals": normals, "feet": feet, "lLine": lLine, "lVlines": lVlines, "lLims": (lMin - 5, lMax + 5), "dldtLine": dldtLine, "dldtVlines": dldtVlines, "dldtLims": (dldtMin - 5, dldtMax + 5)}
+
+def ellipseAnimationFrame(iframe, artists, allFrameThetas, points, lFrames, dldtFrames):
+	"""
+	Function to be passed to FuncAnimation (with blit = True) which handles drawing individual frames, by updating the artists from ellipseAnimationInit.
+	Returns the artists which changed.
+	"""
+	a, b = artists["a"], artists["b"]
+	x1, y1 = points[iframe]
+	thetas = allFrameThetas[iframe][~np.isnan(allFrameThetas[iframe])]
+
+	artists["point"].set_data([x1], [y1])
+	for k, (normal, foot) in enumerate(zip(artists["normals"], artists["feet"])):
+		if k < len(thetas):
+			normal.set_data([x1, a * np.cos(thetas[k])], [y1, b * np.sin(thetas[k])])
+			foot.set_data([a * np.cos(thetas[k])], [b * np.sin(thetas[k])])
+		else:
+			normal.set_data([], [])
+			foot.set_data([], [])
+
+	artists["lLine"].set_ydata(lFrames[iframe])
+	artists["lVlines"].set_segments([[(theta, artists["lLims"][0]), (theta, artists["lLims"][1])] for theta in thetas])
+	artists["dldtLine"].set_ydata(dldtFrames[iframe])
+	artists["dldtVlines"].set_segments([[(theta, artists["dldtLims"][0]), (theta, artists["dldtLims"][1])] for theta in thetas])
+
+	return [artists["point"], *artists["normals"], *artists["feet"], artists["lLine"], artists["lVlines"], artists["dldtLine"], artists["dldtVlines"]]
+
+def lFuncAnimationInit(fig, t, animFrames):
+	"""
+	Set up the axes of the l(t) animation on `fig`, with its limits (found once, from all the frames).
+	Returns the line which lFuncAnimationFrame updates.
+	"""
+	ax = fig.subplots()
+	line, = ax.plot(t, animFrames[0])
+	ax.grid(visible = True)
+	ax.set_xlim(np.min(t), np.max(t))
+	ax.set_ylim(0, np.nanmax(animFrames) * 1.1)
+	ax.set_xlabel("$t$")
+	ax.set_ylabel("$l(t)$")
+	return line
+
+def lFuncAnimationFrame(iframe, line, animFrames):
+	"""
+	Function to be passed to FuncAnimation (with blit = True) which handles drawing individual frames of the l(t) animation.
+	"""
+	line.set_ydata(animFrames[iframe])
+	return [line]
+
+# The arguments of an export worker process (given once to each worker), and the figure and artists it sets up from them on its first frame
+exportSetup = None
+exportFig = None
+exportArtists = None
+
+def initExportWorker(*setup):
+	"""
+	Give an export worker the arguments it needs to set up its figure. The figure itself is only made on the first frame (see exportWorkerFn), since the pool would keep restarting workers whose initializer fails rather than reporting the error.
+	"""
+	global exportSetup
+	exportSetup = setup
+
+def exportWorkerFn(iframe):
+	"""
+	Function which is executed in an export worker process. Each call renders one frame, returning its RGBA pixels. The first call makes the figure the worker renders its frames on, using `initFn` to set up its artists.
+	"""
+	global exportFig, exportArtists
+	figsize, dpi, initFn, initArgs, frameFn, frameArgs = exportSetup
+	if exportFig is None:
+		from matplotlib.figure import Figure
+		from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+		exportFig = Figure(figsize = figsize, dpi = dpi)
+		FigureCanvasAgg(exportFig)
+		exportArtists = initFn(exportFig, *initArgs)
+
+	frameFn(iframe, exportArtists, *frameArgs)
+	exportFig.canvas.draw()
+	return np.asarray(exportFig.canvas.buffer_rgba()).copy()
+
+def exportAnimation(filename, numFrames, initFn, initArgs, frameFn, frameArgs, figsize = None, dpi = 100, fps = 30, numWorkers = None):
+	"""
+	Save an animation made with `initFn` and `frameFn` (e.g. ellipseAnimationInit and ellipseAnimationFrame) without showing it. The frames are rendered in parallel by `numWorkers` processes (all cores by default), each with its own figure, and streamed in order to the video writer: Pillow for .gif files, otherwise ffmpeg (which must be installed). Raises a RuntimeError if ffmpeg can't be found or fails.
+	"""
+	from multiprocessing import Pool
+	import subprocess
+	import tempfile
+	from PIL import Image
+
+	with Pool(numWorkers, initializer = initExportWorker, initargs = (figsize, dpi, initFn, initArgs, frameFn, frameArgs)) as pool:
+		frames = pool.imap(exportWorkerFn, range(numFrames), chunksize = 4)
+
+		if filename.endswith(".gif"):
+			images = (Image.fromarray(frame).convert("RGB") for frame in frames)
+			next(images).save(filename, save_all = True, append_images = images, duration = 1000 / fps, loop = 0)
+			return
+
+		first = next(frames)
+		try:
+			# ffmpeg's errors go to a temporary file rather than a pipe, which could fill up and block it while the frames are written
+			with tempfile.TemporaryFile() as errors:
+				ffmpeg = subprocess.Popen(["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{first.shape[1]}x{first.shape[0]}", "-r", str(fps), "-i", "-", "-pix_fmt", "yuv420p", filename], stdin = subprocess.PIPE, stderr = errors)
+				try:
+					ffmpeg.stdin.write(first.tobytes())
+					for iframe, frame in enumerate(frames):
+						print(f"Saving frame {iframe + 2}/{numFrames}")
+						ffmpeg.stdin.write(frame.tobytes())
+					ffmpeg.stdin.close()
+				except BrokenPipeError:
+					pass # ffmpeg has stopped, and its return code says why
+				ffmpeg.wait()
+				errors.seek(0)
+				message = errors.read().decode(errors = "replace").strip()
+		except FileNotFoundError:
+			raise RuntimeError("ffmpeg wasn't found, so only .gif files can be saved") from None
+		if ffmpeg.returncode != 0:
+			raise RuntimeError(f"ffmpeg failed to save {filename} (exit code {ffmpeg.returncode}): {message}")
+
+def showBig(numSols, x1Len = 10000, y1Len = 10000, deltax1 = 0.00022002200220022004, deltay1 =0.0005000500050005, a = 2, b = 1, showEllipse = True, showEvolute = True, showIm = True, saveIm = False, dpi = 400, precs = None):
 	"""
 	Given the first quadrant of the number of normals image, make the full image. Default numerical values correspond to the images in the report.
+	If `precs` is given, `numSols` holds root gap codes (see encodeRootGaps) and an image is made for each precision in `precs`, otherwise `numSols` holds the counts for each precision.
 	"""
-	for i in range(numSols.shape[2]):
+	import matplotlib.pyplot as plt # Only imported when needed, so that worker processes which just solve start quickly
+
+	for i in range(numSols.shape[2] if precs is None else len(precs)):
 		plt.clf()
 
 		# Make all four quadrants
-		precIm = numSols[:, :, i]
+		precIm = numSols[:, :, i] if precs is None else countsAtPrecision(numSols, precs[i])
 		fullIm = np.zeros([y1Len * 2 - 1, x1Len * 2 - 1])
 		topLeft = np.flip(np.flip(precIm, 1), 0)
 		topRight = np.flip(precIm, 0)
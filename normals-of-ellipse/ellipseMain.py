@@ -1,117 +1,142 @@
 from ellipseLib import *
+from ellipseGrid import computeGrid, createGridFile, computeGridFile, adaptiveGrid
+from ellipsoidLib import computeVolume, exportSlice, exportIsosurface
+import json
 import time
-import threading
 
-def threadFn(a, b, i, startJ, endJ, x1s, y1, precs):
-	"""
-	Function which is executed on a single thread. Each thread evaluates an equal amount of a row of the image.
-	"""
-	for j in range(startJ, endJ):
-		sol = findAngles(a, b, x1s[j], y1)
+if __name__ == "__main__":
+	choice = int(input("Enter option:\nGenerate new (0)\nContinue previous (1)\nShow complete (2)\nGenerate from evolute (3)\nGenerate adaptively (4)\nRender complete to PNG (5)\nGenerate ellipsoid volume (6)\nExport ellipsoid volume (7): "))
 
-		# Assume that any solutions which are the same to certain number of d.p. are the same
-		for k in range(len(precs)):
-			numSols[i, j, k] = len(np.unique(np.round(sol, precs[k])))
+	a, b = 2, 1
 
-choice = int(input("Enter option:\nGenerate new (0)\nContinue previous (1)\nShow complete (2): "))
+	# Generate a grid of points on which to solve (we only consider the first quadrant, the rest is symmetric)
+	x1s = np.linspace(0, a * 1.1, 10000)
+	y1s = np.linspace(0, b * 5, 10000)
 
-a, b = 2, 1
+	if choice == 0:
+		# Make a new image
+		numWorkers = int(input("Number of worker processes: "))
+		startTime = time.time()
 
-# Generate a grid of points on which to solve (we only consider the first quadrant, the rest is symmetric)
-x1s = np.linspace(0, a * 1.1, 10000)
-y1s = np.linspace(0, b * 5, 10000)
+		filename = input("Enter filename (without extension, _ to not save): ")
+		cacheDir = input("Enter tile cache directory (_ for no cache): ")
+		cacheDir = None if cacheDir == "_" else cacheDir
 
-if choice == 0:
-	# Make a new image
-	numThreads = int(input("Number of threads: "))
-	startTime = time.time()
-
-	# List of number of decimal places to consider solutions the same
-	precs = [3, 5, 7, 9]
-
-	# Array to store the number of solutions for the point (x1s[i], y1s[j])
-	numSols = np.zeros([len(y1s), len(x1s), len(precs)])
-
-	filename = input("Enter filename (_ to not save): ")
-	saveFreq = int(input("How often should the file be saved? "))
-
-	# Find the number of solutions for every point on the grid
-	for i, y1 in enumerate(y1s):
-		print(i, y1)
-
-		# Split the work among the threads
-		numPerThread = int(len(x1s) / numThreads)
-		threads = []
-		for j in range(numThreads):
-			threads.append(threading.Thread(target = threadFn, args = (a, b, i, j * numPerThread, (j + 1) * numPerThread, x1s, y1, precs)))
-			threads[j].start()
-
-		for t in threads:
-			t.join()
-
-		if i % saveFreq == 0:
-			if filename != "_": np.save(f"{filename}.npy", numSols)
-			print(f"File saved to {filename}.npy")
-
-	endTime = time.time()
-	print(f"{x1s.size * y1s.size} points took {endTime - startTime}s")
-
-	# Save the points
-	if filename != "_": np.save(f"{filename}.npy", numSols)
-	print(f"File saved to {filename}.npy")
-elif choice == 1:
-	# Continue from a given file
-	numThreads = int(input("Number of threads: "))
-
-	# List of number of decimal places to consider solutions the same
-	precs = [3, 5, 7, 9]
-
-	# Get the file
-	filename = int(input("Enter filename (with extension): "))
-	numSols = np.load(filename)
-	saveFreq = int(input("How often should the file be saved? "))
-
-	# Find where we left off
-	i1 = np.min(np.where(numSols == 0)[0])
-
-	# Find the number of solutions for every point on the grid
-	for i, y1 in enumerate(y1s):
-		# Skip to where we left off
-		if i < i1:
-			print(f"Skipping {i}")
-			continue
-
-		print(i, y1)
-
-		# Split the work among the threads
-		numPerThread = int(len(x1s) / numThreads)
-		threads = []
-		for j in range(numThreads):
-			threads.append(threading.Thread(target = threadFn, args = (a, b, i, j * numPerThread, (j + 1) * numPerThread, x1s, y1, precs)))
-			threads[j].start()
-
-		for t in threads:
-			t.join()
-
-		if i % saveFreq == 0:
-			if filename != "_": np.save(f"{filename}.npy", numSols)
+		# Find the solutions for every point on the grid, numSols[i, j] being the root gap codes for the point (x1s[j], y1s[i]) (the number of solutions to any precision can be found from these afterwards)
+		if filename == "_":
+			numSols = computeGrid(a, b, x1s, y1s, numWorkers, cacheDir = cacheDir)
+		else:
+			saveFreq = int(input("How often (in tiles) should progress be saved? "))
+			createGridFile(filename, a, b, x1s, y1s)
+			numSols = computeGridFile(filename, numWorkers, saveFreq, cacheDir)
 			print(f"File saved to {filename}.npy")
 
-	# Save the points
-	np.save(f"{filename}.npy", numSols)
-	print(f"File saved to {filename}.npy")
-elif choice == 2:
-	# Show a complete image, from a given file
-	filename = input("Enter filename (with extension): ")
-	showEllipse = True if input("Show ellipse? ")[0].lower() == "y" else False
-	showEvolute = True if input("Show evolute? ")[0].lower() == "y" else False
-	showImages = True if input("Show images? ")[0].lower() == "y" else False
-	saveImages = True if input("Save images? ")[0].lower() == "y" else False
-	dpi = input("Enter dpi (_ for default): ")
-	numSols = np.load(filename)
-
-	# Generate the full image(s)
-	if dpi == "_":
-		showBig(numSols, x1s.shape[0], y1s.shape[0], x1s[1] - x1s[0], y1s[1] - y1s[0], a, b, showEllipse = showEllipse, showEvolute = showEvolute, showIm = showImages, saveIm = saveImages)
-	else:
-		showBig(numSols, x1s.shape[0], y1s.shape[0], x1s[1] - x1s[0], y1s[1] - y1s[0], a, b, showEllipse = showEllipse, showEvolute = showEvolute, dpi = int(dpi), showIm = showImages, saveIm = saveImages)
\ No newline at end of file
+		endTime = time.time()
+		print(f"{x1s.size * y1s.size} points took {endTime - startTime}s")
+	elif choice == 1:
+		# Continue from a given file (the grid etc. are read from it)
+		numWorkers = int(input("Number of worker processes: "))
+		filename = input("Enter filename (without extension): ")
+		saveFreq = int(input("How often (in tiles) should progress be saved? "))
+		cacheDir = input("Enter tile cache directory (_ for no cache): ")
+
+		numSols = computeGridFile(filename, numWorkers, saveFreq, None if cacheDir == "_" else cacheDir)
+		print(f"File saved to {filename}.npy")
+	elif choice == 2:
+		# Show a complete image, from a given file
+		filename = input("Enter filename (with extension): ")
+		showEllipse = True if input("Show ellipse? ")[0].lower() == "y" else False
+		showEvolute = True if input("Show evolute? ")[0].lower() == "y" else False
+		showImages = True if input("Show images? ")[0].lower() == "y" else False
+		saveImages = True if input("Save images? ")[0].lower() == "y" else False
+		dpi = input("Enter dpi (_ for default): ")
+
+		# List of number of decimal places to consider solutions the same
+		precs = [float(p) for p in input("Enter precisions (d.p.) to show, separated by spaces: ").split()]
+		numSols = np.load(filename, mmap_mode = "r")
+
+		# Generate the full image(s)
+		if dpi == "_":
+			showBig(numSols, x1s.shape[0], y1s.shape[0], x1s[1] - x1s[0], y1s[1] - y1s[0], a, b, showEllipse = showEllipse, showEvolute = showEvolute, showIm = showImages, saveIm = saveImages, precs = precs)
+		else:
+			showBig(numSols, x1s.shape[0], y1s.shape[0], x1s[1] - x1s[0], y1s[1] - y1s[0], a, b, showEllipse = showEllipse, showEvolute = showEvolute, dpi = int(dpi), showIm = showImages, saveIm = saveImages, precs = precs)
+	elif choice == 3:
+		# Make a new image by classifying points against the evolute, only solving numerically close to it
+		startTime = time.time()
+
+		# List of number of decimal places to consider solutions the same
+		precs = [3, 5, 7, 9]
+
+		filename = input("Enter filename (_ to not save): ")
+		tol = float(input("Relative width of band around the evolute to validate numerically: "))
+
+		X, Y = np.meshgrid(x1s, y1s)
+		counts, band = analyticNormalCount(a, b, X, Y, tol)
+		print(f"Validating {np.count_nonzero(band)} points near the evolute")
+
+		numSols = validateNormalCount(a, b, X, Y, counts, band)
+		for prec in precs:
+			numDisagree = np.count_nonzero(countsAtPrecision(numSols[band], prec) != counts[band])
+			print(f"{prec} d.p.: {numDisagree} points disagreed with the evolute")
+
+		endTime = time.time()
+		print(f"{x1s.size * y1s.size} points took {endTime - startTime}s")
+
+		# Save the points
+		if filename != "_": np.save(f"{filename}.npy", numSols)
+		print(f"File saved to {filename}.npy")
+	elif choice == 4:
+		# Make a new image by only solving where the number of solutions changes
+		startTime = time.time()
+
+		filename = input("Enter filename (_ to not save): ")
+		prec = float(input("Number of decimal places to consider solutions the same: "))
+
+		numSols, numSolved = adaptiveGrid(a, b, x1s, y1s, prec)
+
+		endTime = time.time()
+		print(f"{x1s.size * y1s.size} points took {endTime - startTime}s ({numSolved} solved)")
+
+		# Save the points
+		if filename != "_": np.save(f"{filename}.npy", numSols)
+		print(f"File saved to {filename}.npy")
+	elif choice == 5:
+		# Stream a complete image from a given file to PNGs, without loading it all
+		filename = input("Enter filename (with extension): ")
+		outFilename = input("Enter output filename (without extension): ")
+		showEllipse = True if input("Show ellipse? ")[0].lower() == "y" else False
+		showEvolute = True if input("Show evolute? ")[0].lower() == "y" else False
+		prec = float(input("Number of decimal places to consider solutions the same: "))
+		levels = int(input("Number of levels of the image pyramid: "))
+		tileSize = input("Tile size in pixels (_ for a single image per level): ")
+		numSols = np.load(filename, mmap_mode = "r")
+
+		from ellipseRender import renderBig
+		renderBig(numSols, outFilename, x1s[1] - x1s[0], y1s[1] - y1s[0], a, b, prec, showEllipse, showEvolute, levels, None if tileSize == "_" else int(tileSize))
+	elif choice == 6:
+		# Make a new volume of the number of normals to an ellipsoid (we only consider the first octant, the rest is symmetric)
+		c = float(input("Enter c (the third semi-axis, not equal to a or b): "))
+		size = int(input("Number of points along each axis: "))
+		numWorkers = int(input("Number of worker processes: "))
+		filename = input("Enter filename (without extension): ")
+		startTime = time.time()
+
+		xs, ys, zs = np.linspace(0, a * 1.5, size), np.linspace(0, b * 1.5, size), np.linspace(0, c * 1.5, size)
+		computeVolume(a, b, c, xs, ys, zs, filename, numWorkers)
+
+		endTime = time.time()
+		print(f"{size ** 3} points took {endTime - startTime}s")
+		print(f"File saved to {filename}.npy")
+	elif choice == 7:
+		# Export slices and the isosurfaces of an ellipsoid volume, from a given file
+		filename = input("Enter filename (without extension): ")
+		with open(f"{filename}.json") as f:
+			meta = json.load(f)
+		volume = np.load(f"{filename}.npy", mmap_mode = "r")
+
+		axis = int(input("Axis to slice along (0 for z, 1 for y, 2 for x): "))
+		for index in [int(k) for k in input("Enter slice indices, separated by spaces: ").split()]:
+			exportSlice(volume, f"{filename}-slice{axis}-{index}.png", axis, index)
+
+		for level in [int(l) for l in input("Enter isosurface levels (number of normals), separated by spaces: ").split()]:
+			exportIsosurface(volume, f"{filename}-iso{level}.obj", meta["xs"], meta["ys"], meta["zs"], level)
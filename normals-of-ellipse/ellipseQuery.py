@@ -0,0 +1,90 @@
+import numpy as np
+import argparse
+import itertools
+import time
+from ellipseLib import lFunc, findAnglesBatch, encodeRootGaps, countsAtPrecision
+
+def queryNormals(a, b, x1s, y1s, prec = 5):
+	"""
+	Find the normals through each of the points (`x1s`, `y1s`), which can be any shape (and are broadcast against each other).
+	Returns the number of normals through each point (to `prec` d.p.), and (..., 4) arrays of the angles of their feet and their lengths (from lFunc), both sorted by angle and nan where there is no root.
+	"""
+	x1s, y1s = np.broadcast_arrays(np.asarray(x1s, dtype = float), np.asarray(y1s, dtype = float))
+	angles, valid = findAnglesBatch(a, b, x1s, y1s)
+	counts = countsAtPrecision(encodeRootGaps(angles, valid), prec)
+	return counts, angles, lFunc(angles, a, b, x1s[..., None], y1s[..., None])
+
+def countPoints(filename, skipRows = 0):
+	"""
+	Return the number of points in the `.npy` or CSV file `filename`, without reading it all into memory.
+	"""
+	if filename.endswith(".npy"):
+		return np.load(filename, mmap_mode = "r").shape[0]
+
+	with open(filename) as f:
+		return sum(1 for line in itertools.islice(f, skipRows, None) if line.strip())
+
+def readPoints(filename, chunkSize, skipRows = 0):
+	"""
+	Generate the points in `filename` as (x1s, y1s) chunks of (at most) `chunkSize` points.
+	`filename` is either a `.npy` file of an (N, 2) array, which is memory-mapped, or a CSV file with x1 and y1 in its first two columns (after `skipRows` header rows).
+	"""
+	if filename.endswith(".npy"):
+		points = np.load(filename, mmap_mode = "r")
+		for start in range(0, points.shape[0], chunkSize):
+			chunk = np.asarray(points[start:start + chunkSize], dtype = float)
+			yield chunk[:, 0], chunk[:, 1]
+		return
+
+	with open(filename) as f:
+		lines = (line for line in itertools.islice(f, skipRows, None) if line.strip())
+		while True:
+			chunk = list(itertools.islice(lines, chunkSize))
+			if not chunk:
+				return
+			chunk = np.loadtxt(chunk, delimiter = ",", usecols = (0, 1), ndmin = 2)
+			yield chunk[:, 0], chunk[:, 1]
+
+def queryFile(inFile, outFile, a, b, prec = 5, chunkSize = 65536, skipRows = 0, verbose = True):
+	"""
+	Find the normals through every point in `inFile` (see readPoints), streaming it through queryNormals `chunkSize` points at a time so that the memory used doesn't depend on the number of points. The results are written to memory-mapped files:
+		`outFile`.counts.npy - the (N,) uint8 number of normals through each point
+		`outFile`.angles.npy - the (N, 4) angles of their feet
+		`outFile`.lengths.npy - the (N, 4) lengths of the normals
+	Returns the three outputs, memory-mapped.
+	"""
+	numPoints = countPoints(inFile, skipRows)
+	counts = np.lib.format.open_memmap(f"{outFile}.counts.npy", mode = "w+", dtype = np.uint8, shape = (numPoints,))
+	angles = np.lib.format.open_memmap(f"{outFile}.angles.npy", mode = "w+", dtype = np.float64, shape = (numPoints, 4))
+	lengths = np.lib.format.open_memmap(f"{outFile}.lengths.npy", mode = "w+", dtype = np.float64, shape = (numPoints, 4))
+
+	startTime = time.time()
+	start = 0
+	for x1s, y1s in readPoints(inFile, chunkSize, skipRows):
+		end = start + len(x1s)
+		counts[start:end], angles[start:end], lengths[start:end] = queryNormals(a, b, x1s, y1s, prec)
+		start = end
+		if verbose: print(f"{end}/{numPoints} points, {end / (time.time() - startTime):.0f} points/s")
+
+	for out in (counts, angles, lengths):
+		out.flush()
+	return counts, angles, lengths
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Answer normals queries without the interactive menu.")
+	commands = parser.add_subparsers(dest = "command", required = True)
+
+	query = commands.add_parser("query", help = "find the normals through every point in a .npy or CSV file")
+	query.add_argument("input", help = ".npy file of an (N, 2) array, or CSV file with x1 and y1 in its first two columns")
+	query.add_argument("output", help = "prefix of the output files (<output>.counts.npy, <output>.angles.npy and <output>.lengths.npy)")
+	query.add_argument("-a", type = float, default = 2, help = "semi-major axis")
+	query.add_argument("-b", type = float, default = 1, help = "semi-minor axis")
+	query.add_argument("--prec", type = float, default = 5, help = "precision (d.p.) to count distinct normals at")
+	query.add_argument("--chunk-size", type = int, default = 65536, help = "number of points to solve at once")
+	query.add_argument("--skip-rows", type = int, default = 0, help = "number of header rows in a CSV input")
+	query.add_argument("--quiet", action = "store_true", help = "don't print the progress")
+	args = parser.parse_args()
+
+	if args.command == "query":
+		queryFile(args.input, args.output, args.a, args.b, args.prec, args.chunk_size, args.skip_rows, not args.quiet)
+		print(f"Results saved to {args.output}.counts.npy, {args.output}.angles.npy and {args.output}.lengths.npy")
@@ -0,0 +1,154 @@
+import numpy as np
+import struct
+import zlib
+import matplotlib
+from ellipseLib import countsAtPrecision
+
+class PngWriter:
+	"""
+	Writes an 8-bit RGB PNG of `width` by `height` pixels to `filename` a strip of rows at a time, compressing each strip as it arrives so that the whole image is never held in memory.
+	"""
+
+	def __init__(self, filename, width, height):
+		self.width = width
+		self.compressor = zlib.compressobj()
+		self.f = open(filename, "wb")
+		self.f.write(b"\x89PNG\r\n\x1a\n")
+		self.chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+	def chunk(self, kind, data):
+		self.f.write(struct.pack(">I", len(data)) + kind + data)
+		self.f.write(struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+	def write(self, strip):
+		"""
+		Add the (rows, width, 3) uint8 array `strip` to the bottom of the image.
+		"""
+		# Each row starts with its filter type (0, no filter)
+		rows = np.zeros([strip.shape[0], self.width * 3 + 1], dtype = np.uint8)
+		rows[:, 1:] = strip.reshape(strip.shape[0], -1)
+		data = self.compressor.compress(rows.tobytes())
+		if data:
+			self.chunk(b"IDAT", data)
+
+	def close(self):
+		self.chunk(b"IDAT", self.compressor.flush())
+		self.chunk(b"IEND", b"")
+		self.f.close()
+
+def writePng(filename, width, height, strips):
+	"""
+	Write an 8-bit RGB PNG to `filename` from `strips`, an iterable of (rows, `width`, 3) uint8 arrays which together make up the `height` rows of the image (see PngWriter).
+	"""
+	writer = PngWriter(filename, width, height)
+	for strip in strips:
+		writer.write(strip)
+	writer.close()
+
+def mirrorIndices(quadrantLen):
+	"""
+	Return, for each row (or column) of the full image made from a quadrant with `quadrantLen` rows (or columns), the row (or column) of the quadrant it shows. This mirrors the quadrant the same way as showBig, without copying it.
+	"""
+	return np.abs(np.arange(2 * quadrantLen - 1) - (quadrantLen - 1))
+
+def curvePixels(x, y, deltax1, deltay1, fullShape, factor):
+	"""
+	Rasterise the curve through the points (`x`, `y`) onto the full image (with the origin in the centre, as in showBig) downsampled by `factor`.
+	Returns the rows and columns of the pixels it passes through, sorted by row.
+	"""
+	cols = np.floor((x / deltax1 + fullShape[1] / 2) / factor).astype(np.int64)
+	rows = np.floor((y / deltay1 + fullShape[0] / 2) / factor).astype(np.int64)
+	inside = (rows >= 0) & (rows < -(-fullShape[0] // factor)) & (cols >= 0) & (cols < -(-fullShape[1] // factor))
+	pixels = np.unique(np.stack([rows[inside], cols[inside]], axis = 1), axis = 0)
+	return pixels[:, 0], pixels[:, 1]
+
+def halve(sums):
+	"""
+	Return the sums of `sums` over 2 by 2 blocks (the last row or column making a block on its own if there are an odd number).
+	"""
+	if len(sums) == 0:
+		return np.zeros((0, -(-sums.shape[1] // 2)))
+	return np.add.reduceat(np.add.reduceat(sums, np.arange(0, len(sums), 2), axis = 0), np.arange(0, sums.shape[1], 2), axis = 1)
+
+def pyramidStrips(numSols, prec, levels, stripRows):
+	"""
+	Generate the sums of the number of normals over the full image (mirrored from the quadrant `numSols` by index arithmetic) over blocks of 2 ** level by 2 ** level pixels, for each of the `levels` levels of a mip-map pyramid, as (level, startRow, sums) strips of `stripRows` rows (fewer for the last of each level).
+	The grid is only read and decoded once, in strips for level 0, and each level after that is made by summing 2 by 2 blocks of the strips of the level before as they arrive, so only about `stripRows` rows of each level are held at once.
+	"""
+	rowIdx, colIdx = mirrorIndices(numSols.shape[0]), mirrorIndices(numSols.shape[1])
+	pending = [np.zeros((0, -(-len(colIdx) // 2 ** level))) for level in range(levels)]
+	unpaired = [np.zeros((0, -(-len(colIdx) // 2 ** max(level - 1, 0)))) for level in range(levels)]
+	numDone = [0] * levels
+
+	def add(level, rows, final):
+		# Pair up the rows from the level before (all of them once it is finished), and hold back an odd one for the next strip
+		if level > 0:
+			rows = np.concatenate([unpaired[level], rows])
+			numPaired = len(rows) if final else len(rows) - len(rows) % 2
+			rows, unpaired[level] = halve(rows[:numPaired]), rows[numPaired:]
+		pending[level] = np.concatenate([pending[level], rows])
+		while len(pending[level]) >= stripRows or (final and len(pending[level]) > 0):
+			strip, pending[level] = pending[level][:stripRows], pending[level][stripRows:]
+			yield level, numDone[level], strip
+			numDone[level] += len(strip)
+			if level + 1 < levels:
+				yield from add(level + 1, strip, False)
+		if final and level + 1 < levels:
+			yield from add(level + 1, np.zeros((0, pending[level].shape[1])), True)
+
+	for startRow in range(0, len(rowIdx), stripRows):
+		# Read the block of the quadrant behind this strip
+		fullRows = rowIdx[startRow:startRow + stripRows]
+		uniqueRows = np.unique(fullRows)
+		block = numSols[uniqueRows][np.searchsorted(uniqueRows, fullRows)][:, colIdx]
+		yield from add(0, (countsAtPrecision(block, prec) if prec is not None else block).astype(np.float64), False)
+	yield from add(0, np.zeros((0, len(colIdx))), True)
+
+def colourStrip(sums, startRow, factor, fullShape, lut, vmin, vmax, overlays):
+	"""
+	Return the strip of `sums` (from pyramidStrips, for the level downsampled by `factor`) starting at `startRow`, as the mean over each block coloured with `lut` and with the `overlays` (a list of (rows, cols, colour)) drawn on top.
+	"""
+	rowSizes = np.minimum(factor, fullShape[0] - factor * np.arange(startRow, startRow + len(sums)))
+	colSizes = np.minimum(factor, fullShape[1] - factor * np.arange(sums.shape[1]))
+	means = sums / np.outer(rowSizes, colSizes)
+	strip = lut[np.clip(np.round((means - vmin) / (vmax - vmin) * (len(lut) - 1)), 0, len(lut) - 1).astype(np.int64)]
+	for rows, cols, colour in overlays:
+		start, end = np.searchsorted(rows, [startRow, startRow + len(sums)])
+		strip[rows[start:end] - startRow, cols[start:end]] = colour
+	return strip
+
+def renderBig(numSols, filename, deltax1 = 0.00022002200220022004, deltay1 = 0.0005000500050005, a = 2, b = 1, prec = None, showEllipse = True, showEvolute = True, levels = 1, tileSize = None, stripRows = 256, vmin = 0, vmax = 4, cmap = "viridis"):
+	"""
+	Like showBig, but stream the full image (for a single precision) straight to PNG files, so that the memory used doesn't depend on the size of the grid. `numSols` can be a memmap, and holds root gap codes if `prec` is given, otherwise counts.
+	The full image isn't made, instead each strip of it is read from the quadrant by index arithmetic, coloured, and has the ellipse and evolute rasterised onto it before being compressed. This is done for `levels` levels of a mip-map pyramid (each half the size of the last, made from the one before as it goes, see pyramidStrips), all in one pass over the grid, written to `filename`-L<level>.png, or if `tileSize` is given, to `filename`-L<level>-<row>-<col>.png tiles of `tileSize` pixels.
+	"""
+	lut = (matplotlib.colormaps[cmap](np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+	fullShape = (2 * numSols.shape[0] - 1, 2 * numSols.shape[1] - 1)
+
+	# Enough points on the curves for them to be continuous at full resolution
+	t = np.linspace(0, 2 * np.pi, 8 * sum(fullShape))
+	curves = []
+	if showEllipse:
+		curves.append((a * np.cos(t), b * np.sin(t), (31, 119, 180)))
+	if showEvolute:
+		curves.append(((a ** 2 - b ** 2) / a * np.cos(t) ** 3, (b ** 2 - a ** 2) / b * np.sin(t) ** 3, (255, 127, 14)))
+
+	overlays, writers = [], []
+	for level in range(levels):
+		factor = 2 ** level
+		height, width = -(-fullShape[0] // factor), -(-fullShape[1] // factor)
+		overlays.append([curvePixels(x, y, deltax1, deltay1, fullShape, factor) + (colour,) for x, y, colour in curves])
+		if tileSize is None:
+			writers.append(PngWriter(f"{filename}-L{level}.png", width, height))
+
+	# Every level is written as the one pass over the grid goes, each strip of a level to its own image or to a row of tiles
+	for level, startRow, sums in pyramidStrips(numSols, prec, levels, stripRows if tileSize is None else tileSize):
+		strip = colourStrip(sums, startRow, 2 ** level, fullShape, lut, vmin, vmax, overlays[level])
+		if tileSize is None:
+			writers[level].write(strip)
+			continue
+		for tileCol, startCol in enumerate(range(0, strip.shape[1], tileSize)):
+			tile = strip[:, startCol:startCol + tileSize]
+			writePng(f"{filename}-L{level}-{startRow // tileSize}-{tileCol}.png", tile.shape[1], tile.shape[0], [tile])
+	for writer in writers:
+		writer.close()
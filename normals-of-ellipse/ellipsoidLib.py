@@ -0,0 +1,187 @@
+import numpy as np
+import json
+import time
+from itertools import product
+from multiprocessing import Pool
+
+def footPolynomials(semiAxes, points):
+	"""
+	Return the coefficients (highest power first, monic) of the polynomials in lambda whose real roots give the feet of the normals from each of the `points` (an (N, len(`semiAxes`)) array, none of whose coordinates are 0) to the ellipsoid (or ellipse) with `semiAxes`.
+	The foot of the normal with parameter lambda is x_i = a_i^2 p_i / (a_i^2 + lambda), which lies on the ellipsoid when
+		prod_j (a_j^2 + lambda)^2 - sum_i a_i^2 p_i^2 prod_{j != i} (a_j^2 + lambda)^2 = 0
+	The products don't depend on the point, so every polynomial is the same fixed combination of them.
+	"""
+	squares = [np.array([1, 2 * a ** 2, a ** 4]) for a in semiAxes]
+	base = np.array([1.0])
+	for square in squares:
+		base = np.polymul(base, square)
+
+	others = np.zeros([len(semiAxes), len(base)])
+	for i in range(len(semiAxes)):
+		other = np.array([1.0])
+		for j, square in enumerate(squares):
+			if j != i:
+				other = np.polymul(other, square)
+		others[i, 2:] = other
+
+	return base[None, :] - (np.asarray(semiAxes) ** 2 * points ** 2) @ others
+
+def polynomialRoots(coeffs):
+	"""
+	Find the roots of each of the monic polynomials `coeffs` (an (N, n + 1) array, highest power first) at once, from the eigenvalues of their batched companion matrices.
+	"""
+	n = coeffs.shape[1] - 1
+	companion = np.zeros([coeffs.shape[0], n, n])
+	companion[:, 0, :] = -coeffs[:, 1:]
+	companion[:, np.arange(1, n), np.arange(n - 1)] = 1
+	return np.linalg.eigvals(companion)
+
+def countEllipsoidNormals(a, b, c, px, py, pz, tol = 1e-6, planeTol = 1e-5):
+	"""
+	Find the number of normals (up to six) through every point (`px`, `py`, `pz`) to the ellipsoid x^2 / a^2 + y^2 / b^2 + z^2 / c^2 = 1, with `a`, `b` and `c` all different (the points are broadcast against each other).
+	Each distinct real root lambda of the sextic in footPolynomials is one normal, with roots closer than `tol` (relative to the largest semi-axis) being the same, as on the evolute in 2-D.
+	When a coordinate p_i is 0 the sextic has the spurious double root -a_i^2, so it is divided out, and the normals with lambda = -a_i^2 are counted instead. These go from the point (in the plane p_i = 0) to feet which are generally off that plane: the other coordinates of the foot are fixed and x_i^2 / a_i^2 = 1 - sum_{j != i} a_j^2 p_j^2 / (a_j^2 - a_i^2)^2, giving two normals (with feet at opposite x_i) if that is positive and one (with its foot on x_i = 0) if it is 0.
+	Very close to a coordinate plane the two roots either side of -a_i^2 can't be told apart, so coordinates within `planeTol` (relative to the largest semi-axis) of 0 are taken to be 0.
+	Returns a uint8 array of counts.
+	"""
+	px, py, pz = np.broadcast_arrays(np.asarray(px, dtype = float), np.asarray(py, dtype = float), np.asarray(pz, dtype = float))
+	shape = px.shape
+
+	# The counts don't change when everything is scaled, so work with the largest semi-axis being 1
+	scale = max(abs(a), abs(b), abs(c))
+	semiAxes = np.array([a, b, c]) / scale
+	points = np.stack([px.ravel(), py.ravel(), pz.ravel()], axis = 1) / scale
+	counts = np.zeros(len(points), dtype = np.uint8)
+
+	# Solve the points with each pattern of zero coordinates together
+	zeros = np.abs(points) < planeTol
+	points[zeros] = 0
+	for pattern in product([False, True], repeat = 3):
+		idx = np.flatnonzero(np.all(zeros == pattern, axis = 1))
+		if len(idx) == 0:
+			continue
+		nonzero, zero = np.flatnonzero(~np.array(pattern)), np.flatnonzero(pattern)
+		count = np.zeros(len(idx), dtype = int)
+
+		if len(nonzero) > 0:
+			roots = polynomialRoots(footPolynomials(semiAxes[nonzero], points[np.ix_(idx, nonzero)]))
+
+			# The real roots, less any at -a_i^2, whose normals (from a point with p_i = 0) are counted below
+			lam = np.where(np.abs(roots.imag) <= tol, roots.real, np.inf)
+			for i in zero:
+				lam[np.abs(lam + semiAxes[i] ** 2) <= tol] = np.inf
+			lam = np.sort(lam, axis = 1)
+			with np.errstate(invalid = "ignore"): # inf - inf
+				count += np.isfinite(lam[:, 0]) + np.sum(np.isfinite(lam[:, 1:]) & (np.diff(lam, axis = 1) > tol), axis = 1)
+
+		for i in zero:
+			footSquared = 1 - np.sum(semiAxes[nonzero] ** 2 * points[np.ix_(idx, nonzero)] ** 2 / (semiAxes[nonzero] ** 2 - semiAxes[i] ** 2) ** 2, axis = 1)
+			count += np.where(footSquared > tol, 2, np.where(footSquared >= -tol, 1, 0))
+
+		counts[idx] = count
+
+	return counts.reshape(shape)
+
+def volumeSliceFn(args):
+	"""
+	Function which is executed in a worker process. Each call counts the normals through every point of one z slice of the volume, `chunkSize` points at a time.
+	"""
+	a, b, c, xs, ys, z, k, chunkSize = args
+	X, Y = np.meshgrid(xs, ys)
+	X, Y = X.ravel(), Y.ravel()
+	counts = np.concatenate([countEllipsoidNormals(a, b, c, X[start:start + chunkSize], Y[start:start + chunkSize], z) for start in range(0, len(X), chunkSize)])
+	return k, counts.reshape(len(ys), len(xs))
+
+def computeVolume(a, b, c, xs, ys, zs, filename = None, numWorkers = None, chunkSize = 65536, verbose = True):
+	"""
+	Find the number of normals to the ellipsoid through every point of the grid `xs` by `ys` by `zs`, which should cover the first octant (starting from 0, the rest is symmetric), sharing the z slices among `numWorkers` processes (all cores by default).
+	The result is a (len(zs), len(ys), len(xs)) uint8 volume. If `filename` is given it is written to `filename`.npy (memory-mapped, so the volume is never all in memory), with the grid in `filename`.json.
+	Returns the volume.
+	"""
+	shape = (len(zs), len(ys), len(xs))
+	if filename is None:
+		volume = np.zeros(shape, dtype = np.uint8)
+	else:
+		volume = np.lib.format.open_memmap(f"{filename}.npy", mode = "w+", dtype = np.uint8, shape = shape)
+		with open(f"{filename}.json", "w") as f:
+			json.dump({"a": a, "b": b, "c": c, "xs": list(map(float, xs)), "ys": list(map(float, ys)), "zs": list(map(float, zs))}, f)
+
+	startTime = time.time()
+	with Pool(numWorkers) as pool:
+		args = [(a, b, c, xs, ys, z, k, chunkSize) for k, z in enumerate(zs)]
+		for n, (k, counts) in enumerate(pool.imap_unordered(volumeSliceFn, args)):
+			volume[k] = counts
+			if verbose: print(f"{n + 1}/{len(zs)} slices, {(n + 1) * len(xs) * len(ys) / (time.time() - startTime):.0f} points/s")
+
+	if filename is not None:
+		volume.flush()
+	return volume
+
+def exportSlice(volume, filename, axis = 0, index = 0, vmin = 0, vmax = 6, cmap = "viridis"):
+	"""
+	Write the slice `index` of the first octant `volume` along `axis` (0 for z, 1 for y, 2 for x) to the PNG `filename`, mirrored into all four quadrants (as in showBig) by index arithmetic.
+	"""
+	import matplotlib
+	from ellipseRender import writePng, mirrorIndices
+
+	octantSlice = np.take(volume, index, axis = axis)
+	fullSlice = octantSlice[np.ix_(mirrorIndices(octantSlice.shape[0]), mirrorIndices(octantSlice.shape[1]))]
+	lut = (matplotlib.colormaps[cmap](np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+	image = lut[np.clip(np.round((fullSlice.astype(float) - vmin) / (vmax - vmin) * 255), 0, 255).astype(np.int64)]
+	writePng(filename, image.shape[1], image.shape[0], [image])
+
+def voxelEdges(xs):
+	"""
+	Return the edges of the voxels centred on `xs` along an axis, the first edge being the mirror plane xs[0] (so that the first voxel is half of the voxel on the plane).
+	"""
+	return np.concatenate([[xs[0]], (xs[:-1] + xs[1:]) / 2, [xs[-1] + (xs[-1] - xs[-2]) / 2]])
+
+def voxelFaces(slab, nextSlice, edges, startZ):
+	"""
+	Find the faces between the voxels in the mask `slab` (the slices of the octant from z index `startZ`, followed by `nextSlice`, all False past the end) and those not in it, other than on the mirror planes.
+	Returns an (N, 4, 3) array of the (x, y, z) corners of each face, anticlockwise seen from outside.
+	"""
+	padded = np.zeros([slab.shape[0] + 1, slab.shape[1] + 1, slab.shape[2] + 1], dtype = bool)
+	padded[:-1, :-1, :-1] = slab
+	padded[-1, :-1, :-1] = nextSlice
+	inside = padded[:-1, :-1, :-1]
+
+	# The voxel after each one along each axis (the mask is indexed (z, y, x)), and the corners of the face between them, anticlockwise seen from +axis
+	neighbours = [
+		(padded[:-1, :-1, 1:], [(1, 0, 0), (1, 1, 0), (1, 1, 1), (1, 0, 1)]),
+		(padded[:-1, 1:, :-1], [(0, 1, 0), (0, 1, 1), (1, 1, 1), (1, 1, 0)]),
+		(padded[1:, :-1, :-1], [(0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)])
+	]
+
+	faces = []
+	for after, corners in neighbours:
+		for outward, corners in ((inside & ~after, corners), (~inside & after, corners[::-1])):
+			k, j, i = np.nonzero(outward)
+			idx = np.stack([i, j, k + startZ], axis = 1)[:, None, :] + np.array(corners)[None, :, :]
+			faces.append(np.stack([edges[d][idx[:, :, d]] for d in range(3)], axis = 2))
+
+	return np.concatenate(faces)
+
+def exportIsosurface(volume, filename, xs, ys, zs, level = 6, slabSize = 64):
+	"""
+	Write the surface of the region where the first octant `volume` (with the grid `xs` by `ys` by `zs`) has at least `level` normals to the OBJ file `filename`, as the faces of its voxels, mirrored into all eight octants.
+	The volume is read `slabSize` slices at a time, so it can be a memmap.
+	"""
+	edges = [voxelEdges(np.asarray(xs, dtype = float)), voxelEdges(np.asarray(ys, dtype = float)), voxelEdges(np.asarray(zs, dtype = float))]
+	numVertices = 0
+
+	with open(filename, "w") as f:
+		for startZ in range(0, volume.shape[0], slabSize):
+			slab = np.asarray(volume[startZ:startZ + slabSize]) >= level
+			nextSlice = np.asarray(volume[startZ + slabSize]) >= level if startZ + slabSize < volume.shape[0] else False
+			faces = voxelFaces(slab, nextSlice, edges, startZ)
+
+			for flips in product([1, -1], repeat = 3):
+				# Reflecting in an odd number of planes turns the faces inside out
+				mirrored = faces * np.array(flips)
+				if np.prod(flips) == -1:
+					mirrored = mirrored[:, ::-1]
+
+				np.savetxt(f, mirrored.reshape(-1, 3), fmt = "v %.6g %.6g %.6g")
+				np.savetxt(f, numVertices + 1 + np.arange(4 * len(mirrored)).reshape(-1, 4), fmt = "f %d %d %d %d")
+				numVertices += 4 * len(mirrored)
@@ -1,4 +1,6 @@
 import numpy as np
+import argparse
+import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from ellipseLib import *
 
@@ -12,16 +14,21 @@ t = np.linspace(0, 2 * np.pi, 1000)
 
 
 # Generate the information for each frame of animation showing how the function and it's derivative change as we move the point to the same positions as in the other animation
-animFrames = np.zeros([x1s.size * y1s.size, t.size])
-mult = 1
-frameNum = 0
-for x1 in x1s:
-	mult *= -1
-	for y1 in y1s:
-		animFrames[frameNum, :] = lFunc(t, a, b, x1, y1)[:]
-		frameNum += 1
+points = animationPoints(x1s, y1s)
+animFrames = lFunc(t[None, :], a, b, points[:, [0]], points[:, [1]])
 
-# Make the animation
-fig, ax = plt.subplots()
-animation = FuncAnimation(fig, lFuncAnimationFrame, frames = animFrames.shape[0], interval = 1, repeat = True, fargs = (ax, t, animFrames))
-plt.show()
\ No newline at end of file
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Animate l(t) for a point moving around the ellipse.")
+	parser.add_argument("--export", default = None, help = "save the animation to this file (.gif, or any format ffmpeg can write) rather than showing it")
+	parser.add_argument("--fps", type = int, default = 30, help = "frames per second of the saved animation")
+	parser.add_argument("--workers", type = int, default = None, help = "number of worker processes rendering the saved frames")
+	args = parser.parse_args()
+
+	if args.export is not None:
+		exportAnimation(args.export, animFrames.shape[0], lFuncAnimationInit, (t, animFrames), lFuncAnimationFrame, (animFrames,), fps = args.fps, numWorkers = args.workers)
+	else:
+		# Make the animation
+		fig = plt.figure()
+		line = lFuncAnimationInit(fig, t, animFrames)
+		animation = FuncAnimation(fig, lFuncAnimationFrame, frames = animFrames.shape[0], interval = 1, repeat = True, blit = True, fargs = (line, animFrames))
+		plt.show()
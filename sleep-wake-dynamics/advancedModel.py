@@ -1,5 +1,7 @@
 import numpy as np
-from scipy.integrate import solve_ivp
+import math
+from dataclasses import dataclass
+from sleepWakeModel import SleepWakeModel, fastQ
 
 Q_max = 100 * 3600
 theta = 10
@@ -29,12 +31,66 @@ def DiffEq(t, V, C, Q_max, sigma, theta, omega, mu, c0):
 	Hdot = (mu * Q(V_m, Q_max, theta, sigma) - H) / chi
 	return [V_vDot, V_mDot, Hdot]
 
+@dataclass(frozen = True)
+class AdvancedParams:
+	"""
+	The parameters of the advanced model, defaulting to the module's values.
+	"""
+	Q_max: float = Q_max
+	theta: float = theta
+	sigma: float = sigma
+	A: float = A
+	vvm: float = vvm
+	vmv: float = vmv
+	vvc: float = vvc
+	vvh: float = vvh
+	chi: float = chi
+	mu: float = mu
+	tau: float = tau
+	omega: float = omega
+	c0: float = c0
+
+def fastDiffEq(t, V, p):
+	"""
+	DiffEq with the parameters `p` (AdvancedParams), for solving with an implicit method (along with jacobian).
+	"""
+	V_v, V_m, H = V
+	Qm, _ = fastQ(V_m, p.Q_max, p.theta, p.sigma)
+	Qv, _ = fastQ(V_v, p.Q_max, p.theta, p.sigma)
+	D = p.vvc * (p.c0 + math.cos(p.omega * t)) + p.vvh * H
+	return [(p.vvm * Qm + D - V_v) / p.tau, (p.A + p.vmv * Qv - V_m) / p.tau, (p.mu * Qm - H) / p.chi]
+
+def jacobian(t, V, p):
+	"""
+	The analytic Jacobian of fastDiffEq w.r.t. (V_v, V_m, H).
+	"""
+	V_v, V_m, H = V
+	_, dQm = fastQ(V_m, p.Q_max, p.theta, p.sigma)
+	_, dQv = fastQ(V_v, p.Q_max, p.theta, p.sigma)
+	return np.array([
+		[-1 / p.tau, p.vvm * dQm / p.tau, p.vvh / p.tau],
+		[p.vmv * dQv / p.tau, -1 / p.tau, 0],
+		[0, p.mu * dQm / p.chi, -1 / p.chi]
+	])
+
+def drive(t, V, p):
+	"""
+	The drive D at the times `t`, for the solution `V`.
+	"""
+	return p.vvc * C(t, p.c0, p.omega) + p.vvh * V[2]
+
+class AdvancedModel(SleepWakeModel):
+	__slots__ = ()
+	Params = AdvancedParams
+	V_0 = (-12, 0, 14) # Initial values for V_v, V_m, H
+	tEnd = 72
+	rhs = staticmethod(fastDiffEq)
+	jac = staticmethod(jacobian)
+	drive = staticmethod(drive)
+
 # Solve
-def solveEq():
-	t = np.linspace(0, 72, 1000)
-	tSpan = [np.min(t), np.max(t)]
-	V_0 = [-12, 0, 14] # Initial values for V_v, V_m, H
-	res = solve_ivp(DiffEq, tSpan, V_0, args = (C, Q_max, sigma, theta, omega, mu, c0), dense_output = True)
-	V = res.sol(t)
-	D = vvc * C(t, c0, omega) + vvh * V[2]
-	return t, V, D
\ No newline at end of file
+def solveEq(transitions = False, stopAfter = None, method = "Radau"):
+	"""
+	Solve the model with the module's parameters (see SleepWakeModel.solve).
+	"""
+	return AdvancedModel().solve(transitions, stopAfter, method)
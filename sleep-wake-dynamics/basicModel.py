@@ -1,5 +1,7 @@
 import numpy as np
-from scipy.integrate import solve_ivp
+import math
+from dataclasses import dataclass
+from sleepWakeModel import SleepWakeModel, fastQ
 
 Dbar = 0.77
 DA = 0.42
@@ -30,12 +32,69 @@ def DiffEq(t, V, Dt, Q_max, sigma, theta, omega, mu):
 	Hdot = (mu * Q(V_m, Q_max, theta, sigma) - H) / chi
 	return [V_vDot, V_mDot, Hdot]
 
+@dataclass(frozen = True)
+class BasicParams:
+	"""
+	The parameters of the basic model, defaulting to the module's values.
+	"""
+	Dbar: float = Dbar
+	DA: float = DA
+	Q_max: float = Q_max
+	theta: float = theta
+	sigma: float = sigma
+	vmaQ: float = vmaQ
+	vvm: float = vvm
+	vmv: float = vmv
+	vvc: float = vvc
+	vvh: float = vvh
+	chi: float = chi
+	mu: float = mu
+	tau_m: float = tau_m
+	tau_v: float = tau_v
+	omega: float = omega
+
+def fastDiffEq(t, V, p):
+	"""
+	DiffEq with the parameters `p` (BasicParams), for solving with an implicit method (along with jacobian).
+	"""
+	V_v, V_m, H = V
+	Qm, _ = fastQ(V_m, p.Q_max, p.theta, p.sigma)
+	Qv, _ = fastQ(V_v, p.Q_max, p.theta, p.sigma)
+	return [(p.vvm * Qm + p.DA * math.cos(p.omega * t) + p.Dbar - V_v) / p.tau_v, (p.vmaQ + p.vmv * Qv - V_m) / p.tau_m, (p.mu * Qm - H) / p.chi]
+
+def jacobian(t, V, p):
+	"""
+	The analytic Jacobian of fastDiffEq w.r.t. (V_v, V_m, H).
+	"""
+	V_v, V_m, H = V
+	_, dQm = fastQ(V_m, p.Q_max, p.theta, p.sigma)
+	_, dQv = fastQ(V_v, p.Q_max, p.theta, p.sigma)
+	return np.array([
+		[-1 / p.tau_v, p.vvm * dQm / p.tau_v, 0],
+		[p.vmv * dQv / p.tau_m, -1 / p.tau_m, 0],
+		[0, p.mu * dQm / p.chi, -1 / p.chi]
+	])
+
+def drive(t, V, p):
+	"""
+	The drive D (here Dt) at the times `t`.
+	"""
+	return p.DA * np.cos(p.omega * t) + p.Dbar
+
+class BasicModel(SleepWakeModel):
+	__slots__ = ()
+	Params = BasicParams
+	V_0 = (0.1, -6.1, 10) # Initial values for V_v, V_m, H
+	# V_0 = (-6.1, 0.1, 10)
+	tEnd = 72
+	tol = 1e-8
+	rhs = staticmethod(fastDiffEq)
+	jac = staticmethod(jacobian)
+	drive = staticmethod(drive)
+
 # Solve
-def solveEq():
-	t = np.linspace(0, 72, 1000)
-	tSpan = [np.min(t), np.max(t)]
-	V_0 = [0.1, -6.1, 10] # Initial values for V_v, V_m, H
-	# V_0 = [-6.1, 0.1, 10]
-	res = solve_ivp(DiffEq, tSpan, V_0, args = (Dt, Q_max, sigma, theta, omega, mu), rtol = 1e-8, atol = 1e-8, dense_output = True)
-	V = res.sol(t)
-	return t, V, Dt(t, omega) # Third return value just to line up with the others
\ No newline at end of file
+def solveEq(transitions = False, stopAfter = None, method = "Radau"):
+	"""
+	Solve the model with the module's parameters (see SleepWakeModel.solve).
+	"""
+	return BasicModel().solve(transitions, stopAfter, method)
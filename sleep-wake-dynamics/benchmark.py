@@ -0,0 +1,47 @@
+import numpy as np
+import time
+from scipy.integrate import solve_ivp
+from sleepEvents import sleepEvents
+import basicModel, advancedModel, caffeine
+
+# For each model: the time span, initial values, and the original (DiffEq, RK45) and fast (fastDiffEq with jacobian) ways of solving it, as (function, args, options)
+models = {
+	"basic": ([0, 72], [0.1, -6.1, 10],
+		(basicModel.DiffEq, (basicModel.Dt, basicModel.Q_max, basicModel.sigma, basicModel.theta, basicModel.omega, basicModel.mu), {"rtol": 1e-8, "atol": 1e-8}),
+		(basicModel.fastDiffEq, (basicModel.BasicParams(),), {"rtol": 1e-8, "atol": 1e-8, "jac": basicModel.jacobian})),
+	"advanced": ([0, 72], [-12, 0, 14],
+		(advancedModel.DiffEq, (advancedModel.C, advancedModel.Q_max, advancedModel.sigma, advancedModel.theta, advancedModel.omega, advancedModel.mu, advancedModel.c0), {}),
+		(advancedModel.fastDiffEq, (advancedModel.AdvancedParams(),), {"rtol": 1e-6, "atol": 1e-6, "jac": advancedModel.jacobian})),
+	"caffeine": ([0, 24], [-12, 0, 14],
+		(caffeine.DiffEq, (caffeine.C, caffeine.Q_max, caffeine.sigma, caffeine.theta, caffeine.omega, caffeine.mu, caffeine.c0, caffeine.gammaC, caffeine.ke, caffeine.ka, caffeine.t0, caffeine.zetaA, caffeine.zetaH, caffeine.vvh, caffeine.A), {}),
+		(caffeine.fastDiffEq, (caffeine.CaffeineParams(),), {"rtol": 1e-6, "atol": 1e-6, "jac": caffeine.jacobian}))
+}
+
+def timeSolve(fun, tSpan, V_0, method, args, options, repeats = 3):
+	"""
+	Solve with solve_ivp (finding the sleep transitions with events) `repeats` times, returning the shortest time taken and the result.
+	"""
+	times = []
+	for _ in range(repeats):
+		startTime = time.perf_counter()
+		res = solve_ivp(fun, tSpan, V_0, method, args = args, events = sleepEvents(), **options)
+		times.append(time.perf_counter() - startTime)
+	return min(times), res
+
+def transitionError(res, ref):
+	"""
+	Return the largest difference between the transition times found in `res` and in the reference solution `ref` (inf if a different number were found).
+	"""
+	times, refTimes = np.sort(np.concatenate(res.t_events)), np.sort(np.concatenate(ref.t_events))
+	return np.max(np.abs(times - refTimes), initial = 0) if len(times) == len(refTimes) else np.inf
+
+if __name__ == "__main__":
+	print(f"{'model':<10}{'path':<24}{'time (s)':>10}{'nfev':>8}{'njev':>6}{'nlu':>6}{'max error (s)':>15}")
+	for name, (tSpan, V_0, (fun, args, options), (fastFun, fastArgs, fastOptions)) in models.items():
+		# A very accurate reference to measure the errors in the transition times against
+		ref = solve_ivp(fastFun, tSpan, V_0, "Radau", args = fastArgs, events = sleepEvents(), **{**fastOptions, "rtol": 1e-11, "atol": 1e-11})
+
+		paths = [("RK45, DiffEq", fun, "RK45", args, options)] + [(f"{method}, fastDiffEq", fastFun, method, fastArgs, fastOptions) for method in ("Radau", "BDF", "LSODA")]
+		for pathName, pathFun, method, pathArgs, pathOptions in paths:
+			seconds, res = timeSolve(pathFun, tSpan, V_0, method, pathArgs, pathOptions)
+			print(f"{name:<10}{pathName:<24}{seconds:>10.3f}{res.nfev:>8}{res.njev:>6}{res.nlu:>6}{transitionError(res, ref) * 3600:>15.3g}")
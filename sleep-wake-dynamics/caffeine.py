@@ -1,5 +1,10 @@
 import numpy as np
+import math
+import dataclasses
+from dataclasses import dataclass
 from scipy.integrate import solve_ivp
+from sleepEvents import ensembleTransitions
+from sleepWakeModel import SleepWakeModel, fastQ
 import matplotlib.pyplot as plt
 
 Q_max = {"m": 100 * 3600, "v": 100 * 3600}
@@ -51,18 +56,167 @@ def DiffEq(t, V, C, Q_max, sigma, theta, omega, mu, c0, gammaC, ke, ka, t0, zeta
 	Hdot = (mu * Q(V_m, Q_max, theta, sigma, "m") - H) / chi
 	return [V_vDot, V_mDot, Hdot]
 
-# Solve
-def solveEq(gammaC = gammaC, ka = ka, ke = ke):
-	t = np.linspace(0, 24, 1000)
-	tSpan = [np.min(t), np.max(t)]
-	V_0 = [-12, 0, 14] # Initial values for V_v, V_m, H
-	res = solve_ivp(DiffEq, tSpan, V_0, args = (C, Q_max, sigma, theta, omega, mu, c0, gammaC, ke, ka, t0, zetaA, zetaH, vvh, A), dense_output = True)
-	V = res.sol(t)
-	D = vvc * C(t, c0, omega) + vvh * V[2]
+@dataclass(frozen = True)
+class CaffeineParams:
+	"""
+	The parameters of the caffeine model, defaulting to the module's values.
+	"""
+	Q_max_m: float = Q_max["m"]
+	Q_max_v: float = Q_max["v"]
+	theta: float = theta
+	sigma: float = sigma
+	A: float = A
+	A_0: float = A_0
+	vvm: float = vvm
+	vmv: float = vmv
+	vvc: float = vvc
+	vvh: float = vvh
+	vvh_0: float = vvh_0
+	chi: float = chi
+	mu: float = mu
+	tau: float = tau
+	omega: float = omega
+	c0: float = c0
+	ka: float = ka
+	ke: float = ke
+	gammaC: float = gammaC
+	t0: float = t0
+	zetaA: float = zetaA
+	zetaH: float = zetaH
+
+def fastDiffEq(t, V, p):
+	"""
+	DiffEq with the parameters `p` (CaffeineParams), for solving with an implicit method (along with jacobian).
+	"""
+	V_v, V_m, H = V
+	if t < p.t0:
+		vvhNow, ANow = p.vvh, p.A
+	else:
+		Z = p.gammaC * (math.exp(-p.ke * (t - p.t0)) - math.exp(-p.ka * (t - p.t0)))
+		vvhNow, ANow = p.vvh_0 * (1 - p.zetaH * Z), p.A_0 + p.zetaA * Z
+
+	Qm, _ = fastQ(V_m, p.Q_max_m, p.theta, p.sigma)
+	Qv, _ = fastQ(V_v, p.Q_max_v, p.theta, p.sigma)
+	D = p.vvc * (p.c0 + math.cos(p.omega * t)) + vvhNow * H
+	return [(p.vvm * Qm + D - V_v) / p.tau, (ANow + p.vmv * Qv - V_m) / p.tau, (p.mu * Qm - H) / p.chi]
+
+def jacobian(t, V, p):
+	"""
+	The analytic Jacobian of fastDiffEq w.r.t. (V_v, V_m, H).
+	"""
+	V_v, V_m, H = V
+	vvhNow = p.vvh if t < p.t0 else p.vvh_0 * (1 - p.zetaH * p.gammaC * (math.exp(-p.ke * (t - p.t0)) - math.exp(-p.ka * (t - p.t0))))
+	_, dQm = fastQ(V_m, p.Q_max_m, p.theta, p.sigma)
+	_, dQv = fastQ(V_v, p.Q_max_v, p.theta, p.sigma)
+	return np.array([
+		[-1 / p.tau, p.vvm * dQm / p.tau, vvhNow / p.tau],
+		[p.vmv * dQv / p.tau, -1 / p.tau, 0],
+		[0, p.mu * dQm / p.chi, -1 / p.chi]
+	])
+
+def caffeineLevel(t, p, doseTimes, doseGammas):
+	"""
+	Return Zc at time t for a schedule of doses, each (given at `doseTimes` with sizes `doseGammas` in mg / kg) adding its own Zc term once it has been taken.
+	"""
+	Z = 0
+	for doseTime, doseGamma in zip(doseTimes, doseGammas):
+		if t >= doseTime:
+			Z += doseGamma * (math.exp(-p.ke * (t - doseTime)) - math.exp(-p.ka * (t - doseTime)))
+	return Z
 
+def multiDoseDiffEq(t, V, p, doseTimes, doseGammas):
+	"""
+	fastDiffEq for a schedule of doses (see caffeineLevel) rather than the single dose of gammaC at t0.
+	"""
+	V_v, V_m, H = V
+	Z = caffeineLevel(t, p, doseTimes, doseGammas)
+	Qm, _ = fastQ(V_m, p.Q_max_m, p.theta, p.sigma)
+	Qv, _ = fastQ(V_v, p.Q_max_v, p.theta, p.sigma)
+	D = p.vvc * (p.c0 + math.cos(p.omega * t)) + p.vvh_0 * (1 - p.zetaH * Z) * H
+	return [(p.vvm * Qm + D - V_v) / p.tau, (p.A_0 + p.zetaA * Z + p.vmv * Qv - V_m) / p.tau, (p.mu * Qm - H) / p.chi]
+
+def multiDoseJacobian(t, V, p, doseTimes, doseGammas):
+	"""
+	The analytic Jacobian of multiDoseDiffEq w.r.t. (V_v, V_m, H).
+	"""
+	V_v, V_m, H = V
+	vvhNow = p.vvh_0 * (1 - p.zetaH * caffeineLevel(t, p, doseTimes, doseGammas))
+	_, dQm = fastQ(V_m, p.Q_max_m, p.theta, p.sigma)
+	_, dQv = fastQ(V_v, p.Q_max_v, p.theta, p.sigma)
+	return np.array([
+		[-1 / p.tau, p.vvm * dQm / p.tau, vvhNow / p.tau],
+		[p.vmv * dQv / p.tau, -1 / p.tau, 0],
+		[0, p.mu * dQm / p.chi, -1 / p.chi]
+	])
+
+def drive(t, V, p):
+	"""
+	The drive D at the times `t`, for the solution `V` (with vvh taken as constant, as it always has been here).
+	"""
+	return p.vvc * C(t, p.c0, p.omega) + p.vvh * V[..., 2, :]
+
+def DiffEqEnsemble(t, V, p):
+	"""
+	DiffEq for an ensemble of n members at once. `V` holds (V_v, V_m, H) for each member in turn, and each of the parameters `p` (CaffeineParams) is either a single value or an array with one value per member.
+	"""
+	V_v, V_m, H = V.reshape(-1, 3).T
+	with np.errstate(over = "ignore"): # Zc is only used after t0
+		Z = Zc(t, p.gammaC, p.ke, p.ka, p.t0)
+	vvhNow = np.where(t >= p.t0, p.vvh_0 * (1 - p.zetaH * Z), p.vvh)
+	ANow = np.where(t >= p.t0, p.A_0 + p.zetaA * Z, p.A)
+
+	Qm = p.Q_max_m / (1 + np.exp(-1 * (V_m - p.theta) / p.sigma))
+	Qv = p.Q_max_v / (1 + np.exp(-1 * (V_v - p.theta) / p.sigma))
+	D = p.vvc * C(t, p.c0, p.omega) + vvhNow * H
+	V_vDot = (p.vvm * Qm + D - V_v) / p.tau
+	V_mDot = (ANow + p.vmv * Qv - V_m) / p.tau
+	Hdot = (p.mu * Qm - H) / p.chi
+	return np.stack(np.broadcast_arrays(V_vDot, V_mDot, Hdot), axis = 1).ravel()
+
+class CaffeineModel(SleepWakeModel):
+	__slots__ = ()
+	Params = CaffeineParams
+	V_0 = (-12, 0, 14) # Initial values for V_v, V_m, H
+	tEnd = 24
+	rhs = staticmethod(fastDiffEq)
+	jac = staticmethod(jacobian)
+	drive = staticmethod(drive)
+
+	def solveEnsemble(self, transitions = False, rtol = 1e-6, atol = 1e-6, **members):
+		"""
+		Solve the model for many parameter sets at once, with the parameters in `members` (single values or arrays, which are broadcast against each other) replacing the model's own. Every member is stacked into one system which is integrated together, so the cost is about that of a single solve.
+		The tolerances are tighter than solve's defaults, since the error of the whole system is measured over all the members together.
+		Returns t, V as an (n, 3, len(t)) array and D as an (n, len(t)) array, and if `transitions` also a list of the transitionSummary of each member, found exactly from the dense output (see ensembleTransitions).
+		"""
+		names = list(members)
+		values = np.broadcast_arrays(*[np.atleast_1d(np.asarray(members[name], dtype = float)) for name in names])
+		n = len(values[0]) if names else 1
+		p = dataclasses.replace(self.params, **dict(zip(names, values)))
+
+		t = np.linspace(0, self.tEnd, 1000)
+		tSpan = [np.min(t), np.max(t)]
+		V_0 = np.tile(self.V_0, n)
+		res = solve_ivp(DiffEqEnsemble, tSpan, V_0, args = (p,), t_eval = t, rtol = rtol, atol = atol, dense_output = transitions)
+		V = res.y.reshape(n, 3, len(t))
+		D = self.drive(t, V, self.params)
+		if transitions:
+			return t, V, D, ensembleTransitions(res.sol, n, np.full(n, self.V_0[0] > self.V_0[1]))
+		return t, V, D
+
+def solveEnsemble(gammaC = gammaC, ka = ka, ke = ke, t0 = t0, zetaA = zetaA, zetaH = zetaH, mu = mu, chi = chi, rtol = 1e-6, atol = 1e-6, transitions = False):
+	"""
+	Solve the model with the module's parameters for many values of those given here at once (see CaffeineModel.solveEnsemble).
+	"""
+	return CaffeineModel().solveEnsemble(transitions, rtol, atol, gammaC = gammaC, ka = ka, ke = ke, t0 = t0, zetaA = zetaA, zetaH = zetaH, mu = mu, chi = chi)
+
+# Solve
+def solveEq(gammaC = gammaC, ka = ka, ke = ke, transitions = False, stopAfter = None, method = "Radau"):
+	"""
+	Solve the model with the module's parameters, other than those given here (see SleepWakeModel.solve).
+	"""
 	# S= c1*D + c2
 	# plt.cla()
 	# plt.plot(t,S)
 	# plt.savefig("sleepy.png")
 
-	return t, V, D
\ No newline at end of file
+	return CaffeineModel(gammaC = gammaC, ka = ka, ke = ke).solve(transitions, stopAfter, method)
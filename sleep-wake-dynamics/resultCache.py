@@ -0,0 +1,74 @@
+import numpy as np
+import dataclasses
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import sleepEvents, sleepWakeModel
+from diskCache import loadEntry, saveEntry, evictCache
+
+defaultCacheDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultCache")
+"""
+Where the results are cached by default.
+"""
+
+@functools.lru_cache
+def codeVersion(modelType):
+	"""
+	Return a hash of the source of the module defining `modelType` and of the modules it is solved with, so that cached results are never reused once the code which made them has changed.
+	"""
+	version = hashlib.sha256()
+	for module in (sys.modules[modelType.__module__], sleepWakeModel, sleepEvents):
+		version.update(inspect.getsource(module).encode())
+	return version.hexdigest()
+
+def resultKey(model, kind, solveArgs):
+	"""
+	Return the cache key of the result of solving `model` in the way `kind` ("solve" or "ensemble") with `solveArgs`: a hash of the model's name, its full set of parameters, its tolerance, the arguments and the code version.
+	"""
+	description = {"model": type(model).__name__, "params": dataclasses.asdict(model.params), "tol": model.tol, "kind": kind, "solveArgs": solveArgs, "code": codeVersion(type(model))}
+	return hashlib.sha256(json.dumps(description, sort_keys = True, default = float).encode()).hexdigest()
+
+def cachedSolve(model, cacheDir = defaultCacheDir, maxBytes = 2 ** 30, **solveArgs):
+	"""
+	Return model.solve(**solveArgs), from the cache in `cacheDir` if it has been solved before, otherwise solving it and caching the result (then trimming the cache to `maxBytes`).
+	"""
+	key = resultKey(model, "solve", solveArgs)
+	result = loadEntry(cacheDir, key, ".pkl", pickle.load)
+	if result is None:
+		result = model.solve(**solveArgs)
+		saveEntry(cacheDir, key, ".pkl", lambda f: pickle.dump(result, f))
+		evictCache(cacheDir, maxBytes, ".pkl")
+	return result
+
+def cachedEnsemble(model, cacheDir = defaultCacheDir, maxBytes = 2 ** 30, transitions = False, ensembleMin = 32, **members):
+	"""
+	Like model.solveEnsemble(transitions, **members), but caching the result of each member separately, so that only the members which haven't been solved before (with the same parameters) are solved.
+	The stacked ensemble is explicit, so it only pays off for many members at once: if fewer than `ensembleMin` are missing they are each solved in turn with the (implicit) solve instead, in this process, so that callers need no `__main__` guard.
+	"""
+	names = list(members)
+	values = np.broadcast_arrays(*[np.atleast_1d(np.asarray(members[name], dtype = float)) for name in names])
+	memberModels = [model.replace(**{name: float(value[k]) for name, value in zip(names, values)}) for k in range(len(values[0]))]
+	keys = [resultKey(memberModel, "ensemble", {"transitions": transitions}) for memberModel in memberModels]
+	results = [loadEntry(cacheDir, key, ".pkl", pickle.load) for key in keys]
+
+	missing = [k for k, result in enumerate(results) if result is None]
+	if 0 < len(missing) < ensembleMin:
+		for k in missing:
+			results[k] = memberModels[k].solveWithTransitions() if transitions else memberModels[k].solve()
+	elif missing:
+		# Solve the missing members together
+		solved = model.solveEnsemble(transitions, **{name: value[missing] for name, value in zip(names, values)})
+		for n, k in enumerate(missing):
+			results[k] = (solved[0], solved[1][n], solved[2][n]) + ((solved[3][n],) if transitions else ())
+	if missing:
+		for k in missing:
+			saveEntry(cacheDir, keys[k], ".pkl", lambda f: pickle.dump(results[k], f))
+		evictCache(cacheDir, maxBytes, ".pkl")
+
+	t = results[0][0]
+	V, D = np.stack([result[1] for result in results]), np.stack([result[2] for result in results])
+	return (t, V, D, [result[3] for result in results]) if transitions else (t, V, D)
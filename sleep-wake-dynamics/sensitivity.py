@@ -0,0 +1,187 @@
+import numpy as np
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+from scipy.stats import qmc
+import caffeine
+from caffeine import CaffeineModel
+from phaseMap import solveBatch
+
+defaultBounds = {
+	"zetaA": (0.01, 0.2),
+	"zetaH": (0.01, 0.2),
+	"ka": (0.5 * caffeine.ka, 1.5 * caffeine.ka),
+	"ke": (0.5 * caffeine.ke, 1.5 * caffeine.ke),
+	"kappa": (50, 400),
+	"bw": (50, 100),
+	"t0": (0, 6),
+	"mu": (0.8 * caffeine.mu, 1.2 * caffeine.mu),
+	"chi": (0.8 * caffeine.chi, 1.2 * caffeine.chi)
+}
+"""
+The range each parameter is sampled uniformly from by default. Any field of CaffeineParams can be used, as well as kappa and bw (see phaseMap.memberChanges).
+"""
+
+outputs = ["onset", "wake", "duration"]
+"""
+The outputs whose sensitivity is measured: the time of the first sleep onset, the time of the wake up which ends that sleep, and the length of the sleep.
+"""
+
+def sobolDesign(bounds, numSamples, seed = 0):
+	"""
+	Return Saltelli's design for estimating Sobol indices: the matrices A and B of `numSamples` quasi-random (scrambled Sobol) points in `bounds`, followed by each matrix AB_i (A with column i taken from B), stacked into one (numSamples * (d + 2), d) array.
+	"""
+	d = len(bounds)
+	low, high = np.array(list(bounds.values()), dtype = float).T
+	AB = qmc.scale(qmc.Sobol(2 * d, seed = seed).random(numSamples), np.tile(low, 2), np.tile(high, 2))
+	A, B = AB[:, :d], AB[:, d:]
+	mixed = [np.where(np.arange(d) == i, B, A) for i in range(d)]
+	return np.concatenate([A, B] + mixed)
+
+def morrisDesign(bounds, numTrajectories, numLevels = 4, seed = 0):
+	"""
+	Return Morris's design: `numTrajectories` trajectories on a grid of `numLevels` levels in each parameter, each starting at a random point and moving every parameter once, in a random order, by delta = `numLevels` / (2 * (`numLevels` - 1)), stacked into one (numTrajectories * (d + 1), d) array.
+	"""
+	d = len(bounds)
+	low, high = np.array(list(bounds.values()), dtype = float).T
+	rng = np.random.default_rng(seed)
+	delta = numLevels / (2 * (numLevels - 1))
+	points = []
+	for _ in range(numTrajectories):
+		start = rng.integers(0, numLevels // 2, d) / (numLevels - 1)
+		signs = rng.choice([-1, 1], d)
+		start = np.where(signs < 0, start + delta, start)
+		steps = np.zeros((d + 1, d))
+		for k, i in enumerate(rng.permutation(d)):
+			steps[k + 1:, i] = signs[i] * delta
+		points.append(start + steps)
+	return low + np.concatenate(points) * (high - low)
+
+def evaluateBatch(args):
+	"""
+	Function which is executed in a worker process. Each call solves a batch of the design together as one ensemble (see phaseMap.solveBatch), returning its first row and the outputs of each point.
+	"""
+	model, names, start, batch = args
+	onset, length, _ = solveBatch((model, names, tuple(batch.T)))
+	return start, np.stack([onset, onset + length, length], axis = 1)
+
+def evaluateDesign(filename, design, names, model = None, batchSize = 128, numWorkers = None, verbose = True):
+	"""
+	Solve the model at every point (row) of `design`, `batchSize` points to an ensemble, shared among `numWorkers` processes. The outputs are written to the memory-mapped file `filename`.outputs.npy as each batch finishes, and the batches done to `filename`.done.npy, so that a run which is stopped can carry on from where it got to when called again with the same design.
+	Returns the (len(design), len(outputs)) outputs, nan where there is no sleep.
+	"""
+	model = model if model is not None else CaffeineModel()
+	numBatches = int(np.ceil(len(design) / batchSize))
+	resume = os.path.exists(f"{filename}.outputs.npy") and os.path.exists(f"{filename}.done.npy")
+	out = np.lib.format.open_memmap(f"{filename}.outputs.npy", mode = "r+" if resume else "w+", dtype = np.float64, shape = (len(design), len(outputs)))
+	done = np.load(f"{filename}.done.npy") if resume else np.zeros(numBatches, dtype = bool)
+	if out.shape != (len(design), len(outputs)) or len(done) != numBatches:
+		raise ValueError(f"{filename} holds the results of a different design")
+
+	startTime = time.time()
+	args = [(model, names, k * batchSize, design[k * batchSize:(k + 1) * batchSize]) for k in range(numBatches) if not done[k]]
+	with Pool(numWorkers) as pool:
+		for start, result in pool.imap_unordered(evaluateBatch, args):
+			out[start:start + len(result)] = result
+			out.flush()
+			done[start // batchSize] = True
+			np.save(f"{filename}.done.tmp.npy", done)
+			os.replace(f"{filename}.done.tmp.npy", f"{filename}.done.npy")
+			if verbose: print(f"{np.count_nonzero(done)}/{numBatches} batches, {time.time() - startTime:.1f}s")
+
+	return np.array(out)
+
+def sobolIndices(Y, d, numResamples = 1000, confidence = 0.95, seed = 0):
+	"""
+	Estimate the first order (Saltelli 2010) and total (Jansen) Sobol indices of the outputs `Y` of sobolDesign with `d` parameters, with bootstrap confidence intervals of level `confidence` from `numResamples` resamples of the base samples. Samples whose outputs aren't all finite are left out.
+	Returns the first order and total indices, each as an array of (estimate, lower, upper) for each parameter.
+	"""
+	Y = Y.reshape(d + 2, -1)
+	Y = Y[:, np.all(np.isfinite(Y), axis = 0)]
+	# Centring the outputs first makes the first order estimates much less noisy when their mean is large compared to their spread
+	Y = Y - np.mean(Y[:2])
+	fA, fB, fAB = Y[0], Y[1], Y[2:]
+
+	def estimate(rows):
+		variance = np.var(np.concatenate([fA[rows], fB[rows]]))
+		first = np.mean(fB[rows] * (fAB[:, rows] - fA[rows]), axis = 1) / variance
+		total = 0.5 * np.mean((fA[rows] - fAB[:, rows]) ** 2, axis = 1) / variance
+		return first, total
+
+	rng = np.random.default_rng(seed)
+	first, total = estimate(np.arange(len(fA)))
+	resamples = [estimate(rng.integers(0, len(fA), len(fA))) for _ in range(numResamples)]
+	tails = [50 * (1 - confidence), 50 * (1 + confidence)]
+	firstCI, totalCI = [np.percentile([resample[k] for resample in resamples], tails, axis = 0) for k in range(2)]
+	return np.column_stack([first, *firstCI]), np.column_stack([total, *totalCI])
+
+def morrisIndices(Y, design, bounds, numResamples = 1000, confidence = 0.95, seed = 0):
+	"""
+	Estimate the Morris indices mu* (the mean absolute elementary effect, in units of the output per range of the parameter) and sigma (their standard deviation) of the outputs `Y` of morrisDesign, with a bootstrap confidence interval for mu* over the trajectories. Trajectories whose outputs aren't all finite are left out.
+	Returns mu* as an array of (estimate, lower, upper) for each parameter, and sigma.
+	"""
+	d = len(bounds)
+	low, high = np.array(list(bounds.values()), dtype = float).T
+	Y, X = Y.reshape(-1, d + 1), ((design - low) / (high - low)).reshape(-1, d + 1, d)
+	keep = np.all(np.isfinite(Y), axis = 1)
+	Y, X = Y[keep], X[keep]
+
+	# The elementary effect of the parameter which moved at each step of each trajectory
+	steps = np.diff(X, axis = 1)
+	moved = np.argmax(np.abs(steps), axis = 2)
+	effects = np.zeros((len(Y), d))
+	np.put_along_axis(effects, moved, np.diff(Y, axis = 1) / np.take_along_axis(steps, moved[..., None], axis = 2)[..., 0], axis = 1)
+
+	rng = np.random.default_rng(seed)
+	muStar = np.mean(np.abs(effects), axis = 0)
+	resamples = [np.mean(np.abs(effects[rng.integers(0, len(effects), len(effects))]), axis = 0) for _ in range(numResamples)]
+	muStarCI = np.percentile(resamples, [50 * (1 - confidence), 50 * (1 + confidence)], axis = 0)
+	return np.column_stack([muStar, *muStarCI]), np.std(effects, axis = 0, ddof = 1)
+
+def analyse(filename, method = "sobol", bounds = defaultBounds, numSamples = 1024, model = None, seed = 0, batchSize = 128, numWorkers = None, verbose = True):
+	"""
+	Run a global sensitivity analysis of the caffeine model's outputs (see outputs) to the parameters in `bounds`, by Sobol indices (`method` "sobol", taking numSamples * (d + 2) runs) or Morris screening ("morris", numSamples trajectories of d + 1 runs).
+	The runs are checkpointed to `filename` as they go (see evaluateDesign), along with the design and settings in `filename`.json, so calling this again with the same settings resumes the analysis. The indices are written to `filename`.indices.json and returned.
+	"""
+	settings = {"method": method, "bounds": {name: list(bound) for name, bound in bounds.items()}, "numSamples": numSamples, "seed": seed, "params": repr(model) if model is not None else None}
+	if os.path.exists(f"{filename}.json"):
+		with open(f"{filename}.json") as f:
+			if json.load(f) != settings:
+				raise ValueError(f"{filename} holds an analysis with different settings")
+	else:
+		for suffix in (".outputs.npy", ".done.npy"):
+			if os.path.exists(filename + suffix): os.remove(filename + suffix)
+		with open(f"{filename}.json", "w") as f:
+			json.dump(settings, f)
+
+	design = sobolDesign(bounds, numSamples, seed) if method == "sobol" else morrisDesign(bounds, numSamples, seed = seed)
+	Y = evaluateDesign(filename, design, list(bounds), model, batchSize, numWorkers, verbose)
+
+	indices = {}
+	for k, output in enumerate(outputs):
+		if method == "sobol":
+			first, total = sobolIndices(Y[:, k], len(bounds), seed = seed)
+			indices[output] = {name: {"S1": list(first[i]), "ST": list(total[i])} for i, name in enumerate(bounds)}
+		else:
+			muStar, sigma = morrisIndices(Y[:, k], design, bounds, seed = seed)
+			indices[output] = {name: {"muStar": list(muStar[i]), "sigma": sigma[i]} for i, name in enumerate(bounds)}
+	with open(f"{filename}.indices.json", "w") as f:
+		json.dump(indices, f, indent = 1)
+	return indices
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Global sensitivity analysis of the sleep onset, wake up and sleep length of the caffeine model.")
+	parser.add_argument("--method", choices = ["sobol", "morris"], default = "sobol")
+	parser.add_argument("--samples", type = int, default = 1024, help = "number of base samples (sobol, a power of 2) or trajectories (morris)")
+	parser.add_argument("--params", nargs = "+", default = list(defaultBounds), choices = list(defaultBounds), help = "parameters to vary")
+	parser.add_argument("--workers", type = int, default = None, help = "number of worker processes")
+	parser.add_argument("--output", default = "sensitivity", help = "prefix of the checkpoint and result files")
+	args = parser.parse_args()
+
+	indices = analyse(args.output, args.method, {name: defaultBounds[name] for name in args.params}, args.samples, numWorkers = args.workers)
+	for output, values in indices.items():
+		print(output)
+		for name, value in values.items():
+			print(f"\t{name:<8}" + "  ".join(f"{index} " + (f"{v[0]:7.3f} [{v[1]:7.3f}, {v[2]:7.3f}]" if isinstance(v, list) else f"{v:7.3f}") for index, v in value.items()))
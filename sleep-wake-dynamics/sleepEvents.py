@@ -0,0 +1,63 @@
+import numpy as np
+
+def sleepEvents(stopAfter = None):
+	"""
+	Return the solve_ivp events for falling asleep (V_v rising above V_m) and waking up (V_v falling below V_m), in that order.
+	If `stopAfter` is given, the integration stops once that many sleep onsets have happened.
+	"""
+	def onset(t, V, *args):
+		return V[0] - V[1]
+	onset.direction = 1
+	onset.terminal = stopAfter if stopAfter is not None else False
+
+	def wake(t, V, *args):
+		return V[0] - V[1]
+	wake.direction = -1
+
+	return [onset, wake]
+
+def transitionSummary(onsets, wakes, asleepAtStart, tStart):
+	"""
+	Summarise the sleep onset and wake times of a run which started (at `tStart`) asleep if `asleepAtStart`.
+	Returns a dict of the onset and wake times, the durations of the complete sleep episodes (those which end before the run does, counting one which was going on at the start from `tStart`) and the number of them, which is the number of sleep-wake cycles.
+	"""
+	onsets, wakes = np.asarray(onsets, dtype = float), np.asarray(wakes, dtype = float)
+	starts = np.concatenate([[tStart], onsets]) if asleepAtStart else onsets
+	durations = wakes - starts[:len(wakes)]
+	return {"onsets": onsets, "wakes": wakes, "durations": durations, "cycles": len(durations)}
+
+def memberDiffs(sol, t, member, chunkSize = 256):
+	"""
+	Evaluate V_v - V_m of each ensemble `member` at the matching time in `t` from the dense output `sol` of the whole ensemble, `chunkSize` times at once.
+	"""
+	diffs = np.empty(len(t))
+	for start in range(0, len(t), chunkSize):
+		V = sol(t[start:start + chunkSize])
+		m, idx = member[start:start + chunkSize], np.arange(V.shape[1])
+		diffs[start:start + chunkSize] = V[3 * m, idx] - V[3 * m + 1, idx]
+	return diffs
+
+def ensembleTransitions(sol, numMembers, asleepAtStart, iters = 12):
+	"""
+	Find the sleep onset and wake times of every member of an ensemble (as solved by caffeine.solveEnsemble, with the states of each member in turn) from the dense output `sol` of the whole system.
+	The sign changes of V_v - V_m are bracketed by the solver steps (as solve_ivp does with events), then all the brackets are refined together with `iters` steps of the Illinois method.
+	Returns a list of transitionSummary dicts, one per member.
+	"""
+	V = sol(sol.ts).reshape(numMembers, 3, -1)
+	diff = V[:, 0] - V[:, 1]
+	member, k = np.nonzero(np.sign(diff[:, :-1]) != np.sign(diff[:, 1:]))
+	rising = diff[member, k + 1] > diff[member, k]
+	lo, hi = sol.ts[k], sol.ts[k + 1]
+	fLo, fHi = diff[member, k], diff[member, k + 1]
+
+	for _ in range(iters):
+		with np.errstate(divide = "ignore", invalid = "ignore"):
+			t = np.where(fHi != fLo, hi - fHi * (hi - lo) / (fHi - fLo), hi)
+		f = memberDiffs(sol, t, member)
+
+		# Keep the root bracketed, halving the value at the end which is kept twice in a row
+		crossed = np.sign(f) != np.sign(fHi)
+		lo, fLo = np.where(crossed, hi, lo), np.where(crossed, fHi, fLo / 2)
+		hi, fHi = t, f
+
+	return [transitionSummary(hi[(member == m) & rising], hi[(member == m) & ~rising], asleepAtStart[m], sol.ts[0]) for m in range(numMembers)]
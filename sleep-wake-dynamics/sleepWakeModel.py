@@ -0,0 +1,98 @@
+import numpy as np
+import dataclasses
+import math
+from itertools import product
+from multiprocessing import Pool
+from scipy.integrate import solve_ivp
+from sleepEvents import sleepEvents, transitionSummary
+
+def fastQ(V, Q_max, theta, sigma):
+	"""
+	Q and its derivative w.r.t. V for a single value of V, using math rather than numpy to keep the overhead per call low.
+	"""
+	q = Q_max / (1 + math.exp(min((theta - V) / sigma, 700)))
+	return q, q * (1 - q / Q_max) / sigma
+
+class SleepWakeModel:
+	"""
+	The interface shared by the sleep-wake models. A model is just an immutable set of parameters (`params`, an instance of the frozen dataclass `Params`) along with the model's equations, so any number of them can be used at once in one process, and they can be sent to thread or process pools.
+	Each model sets `Params`, the initial values `V_0`, the end time `tEnd` and the solver tolerance `tol`, and gives its equations as static methods `rhs(t, V, p)`, `jac(t, V, p)` and `drive(t, V, p)` (which returns D), where `p` is the parameters.
+	"""
+	__slots__ = ("params",)
+	Params = None
+	V_0 = None
+	tEnd = None
+	tol = 1e-6
+
+	def __init__(self, params = None, **changes):
+		object.__setattr__(self, "params", dataclasses.replace(params if params is not None else self.Params(), **changes))
+
+	def __setattr__(self, name, value):
+		raise AttributeError(f"{type(self).__name__} is immutable, use replace instead")
+
+	def __reduce__(self):
+		return (type(self), (self.params,))
+
+	def __eq__(self, other):
+		return type(self) == type(other) and self.params == other.params
+
+	def __hash__(self):
+		return hash((type(self), self.params))
+
+	def __repr__(self):
+		return f"{type(self).__name__}({self.params})"
+
+	def replace(self, **changes):
+		"""
+		Return a copy of the model with the parameters in `changes` changed.
+		"""
+		return type(self)(self.params, **changes)
+
+	def solve(self, transitions = False, stopAfter = None, method = "Radau"):
+		"""
+		Solve the model, returning t, V and D at 1000 evenly spaced times. The models are stiff (tau is much shorter than chi), so they are solved with the implicit `method` using the analytic Jacobian.
+		If `transitions`, the sleep onsets and wake ups are found exactly with solve_ivp events instead (stopping after `stopAfter` onsets, if given), without any dense output, and their transitionSummary is returned.
+		"""
+		t = np.linspace(0, self.tEnd, 1000)
+		tSpan = [np.min(t), np.max(t)]
+		if transitions:
+			res = solve_ivp(self.rhs, tSpan, self.V_0, method, args = (self.params,), rtol = self.tol, atol = self.tol, jac = self.jac, events = sleepEvents(stopAfter))
+			return transitionSummary(*res.t_events, self.V_0[0] > self.V_0[1], tSpan[0])
+
+		res = solve_ivp(self.rhs, tSpan, self.V_0, method, args = (self.params,), rtol = self.tol, atol = self.tol, jac = self.jac, dense_output = True)
+		V = res.sol(t)
+		return t, V, self.drive(t, V, self.params)
+
+	def solveWithTransitions(self, method = "Radau"):
+		"""
+		Solve the model once for both the results of solve: t, V and D at 1000 evenly spaced times, followed by the transitionSummary of the sleep onsets and wake ups (found exactly with events).
+		"""
+		t = np.linspace(0, self.tEnd, 1000)
+		tSpan = [np.min(t), np.max(t)]
+		res = solve_ivp(self.rhs, tSpan, self.V_0, method, args = (self.params,), rtol = self.tol, atol = self.tol, jac = self.jac, events = sleepEvents(), dense_output = True)
+		V = res.sol(t)
+		return t, V, self.drive(t, V, self.params), transitionSummary(*res.t_events, self.V_0[0] > self.V_0[1], tSpan[0])
+
+def gridPoints(paramGrid):
+	"""
+	Return the list of parameter changes described by `paramGrid`, which is either a list of dicts of changes, or a dict of lists of values for each parameter, of which every combination is taken (the last parameter varying fastest).
+	"""
+	if isinstance(paramGrid, dict):
+		return [dict(zip(paramGrid, values)) for values in product(*paramGrid.values())]
+	return list(paramGrid)
+
+def solveModel(args):
+	"""
+	Function which is executed in a worker process. Each call solves one model.
+	"""
+	model, solveArgs = args
+	return model.solve(**solveArgs)
+
+def sweep(model, paramGrid, numWorkers = None, **solveArgs):
+	"""
+	Solve `model` with every set of parameter changes in `paramGrid` (see gridPoints), sharing the runs among `numWorkers` processes (all cores by default). `solveArgs` are passed on to solve.
+	Returns the results of solve for each point of the grid, in order.
+	"""
+	models = [model.replace(**changes) for changes in gridPoints(paramGrid)]
+	with Pool(numWorkers) as pool:
+		return pool.map(solveModel, [(m, solveArgs) for m in models])
@@ -0,0 +1,199 @@
+import numpy as np
+import argparse
+import datetime
+import json
+import time
+from itertools import combinations
+from multiprocessing import Pool
+from scipy.integrate import trapezoid
+
+def presentCompanies(D):
+	"""
+	Return the indices of the companies in the distance matrix `D` which have a distance to any other (those which don't are removed, as calcNetwork in script.r does with removeNA).
+	"""
+	offDiagonal = ~np.eye(len(D), dtype = bool)
+	return np.flatnonzero(np.any(np.isfinite(D) & offDiagonal, axis = 1))
+
+def primTree(D):
+	"""
+	Return the edges of the minimum spanning tree of the complete graph with weights `D`, found with Prim's algorithm, as an (n - 1, 2) array of (parent, child) in the order they were added, so every parent comes before its children.
+	"""
+	n = len(D)
+	edges = np.empty((n - 1, 2), dtype = np.int64)
+	best, parent = D[0].astype(float), np.zeros(n, dtype = np.int64)
+	best[0] = np.inf
+	inTree = np.zeros(n, dtype = bool)
+	inTree[0] = True
+	for k in range(n - 1):
+		v = np.argmin(np.where(inTree, np.inf, best))
+		edges[k] = parent[v], v
+		inTree[v] = True
+		closer = D[v] < best
+		best[closer], parent[closer] = D[v][closer], v
+	return edges
+
+def h1Pairs(D, maxScale):
+	"""
+	Return the (birth, death) pairs of the 1-dimensional persistent homology of the Vietoris-Rips filtration of `D`, only taking the edges no longer than `maxScale` (so the complex is sparser when it is smaller) and the triangles between them.
+	The edges are sorted by length, the edges which join components (found with union-find) are the H0 deaths, and the rest create cycles. The boundaries of the triangles (in order of their longest edge) are reduced over Z2, each column kept as a Python int with a bit for each edge, so adding two columns is a single xor. A cycle which is never filled in dies at `maxScale`.
+	"""
+	n = len(D)
+	I, J = np.triu_indices(n, 1)
+	keep = D[I, J] <= maxScale
+	order = np.argsort(D[I, J][keep], kind = "stable")
+	I, J = I[keep][order], J[keep][order]
+	weights = D[I, J]
+	edgeIndex = np.full((n, n), -1, dtype = np.int64)
+	edgeIndex[I, J] = edgeIndex[J, I] = np.arange(len(I))
+
+	# Union-find to sort the edges which join components from those which create cycles
+	root = list(range(n))
+	def find(v):
+		while root[v] != v:
+			root[v] = root[root[v]]
+			v = root[v]
+		return v
+	creates = np.zeros(len(I), dtype = bool)
+	for e, (i, j) in enumerate(zip(I, J)):
+		ri, rj = find(i), find(j)
+		if ri == rj:
+			creates[e] = True
+		else:
+			root[ri] = rj
+
+	# The triangles all of whose edges are in the complex, in the order they appear
+	triangles = np.array(list(combinations(range(n), 3)), dtype = np.int64).reshape(-1, 3)
+	triEdges = np.stack([edgeIndex[triangles[:, 0], triangles[:, 1]], edgeIndex[triangles[:, 0], triangles[:, 2]], edgeIndex[triangles[:, 1], triangles[:, 2]]], axis = 1)
+	triEdges = triEdges[np.all(triEdges >= 0, axis = 1)]
+	triEdges = triEdges[np.argsort(np.max(triEdges, axis = 1), kind = "stable")]
+
+	pivots, pairs = {}, []
+	for a, b, c in triEdges.tolist():
+		column = (1 << a) | (1 << b) | (1 << c)
+		while column:
+			low = column.bit_length() - 1
+			if low not in pivots:
+				pivots[low] = column
+				death = weights[max(a, b, c)]
+				if death > weights[low]:
+					pairs.append((weights[low], death))
+				break
+			column ^= pivots[low]
+
+	pairs.extend((weights[e], maxScale) for e in np.flatnonzero(creates) if e not in pivots)
+	return np.array(pairs, dtype = float).reshape(-1, 2)
+
+def landscapes(pairs, grid, numLandscapes):
+	"""
+	Return the first `numLandscapes` persistence landscapes of the (birth, death) `pairs` on `grid`: the kth is the kth largest of the tent functions max(0, min(t - birth, death - t)).
+	"""
+	out = np.zeros((numLandscapes, len(grid)))
+	if len(pairs) > 0:
+		tents = np.maximum(0, np.minimum(grid - pairs[:, :1], pairs[:, 1:] - grid))
+		top = -np.sort(-tents, axis = 0)[:numLandscapes]
+		out[:len(top)] = top
+	return out
+
+def landscapeNorms(landscape, grid, reference):
+	"""
+	Return the L1 and L2 norms of `landscape` (all the landscapes of one dimension) and its L2 distance from `reference`.
+	"""
+	return trapezoid(np.sum(landscape, axis = 0), grid), np.sqrt(trapezoid(np.sum(landscape ** 2, axis = 0), grid)), np.sqrt(trapezoid(np.sum((landscape - reference) ** 2, axis = 0), grid))
+
+def processChunk(args):
+	"""
+	Function which is executed in a worker process. Each call goes through the dates `start` to `end` in order, writing their H0 deaths, landscapes and norms straight into the output files, and returns the H1 pairs as rows of (date index, birth, death).
+	"""
+	distanceFile, filename, start, end, settings, reference = args
+	distances = np.load(distanceFile, mmap_mode = "r")
+	h0 = np.load(f"{filename}.h0.npy", mmap_mode = "r+")
+	landscapeOut = np.load(f"{filename}.landscapes.npy", mmap_mode = "r+")
+	norms = np.load(f"{filename}.norms.npy", mmap_mode = "r+")
+	grid = np.linspace(0, settings["maxScale"], settings["gridSize"])
+
+	h1Rows = []
+	for k in range(start, end):
+		D = np.array(distances[k])
+		present = presentCompanies(D)
+		D = D[np.ix_(present, present)]
+
+		edges = primTree(D) if len(D) > 1 else np.zeros((0, 2), dtype = np.int64)
+		deaths = np.sort(np.minimum(D[edges[:, 0], edges[:, 1]], settings["maxScale"]))
+		h0[k] = np.nan
+		h0[k, :len(deaths)] = deaths
+		diagrams = [np.column_stack([np.zeros(len(deaths) + 1), np.append(deaths, settings["maxScale"])])]
+		if settings["h1"]:
+			pairs = h1Pairs(D, settings["maxScale"])
+			h1Rows.extend((k, birth, death) for birth, death in pairs)
+			diagrams.append(pairs)
+
+		for dim, pairs in enumerate(diagrams):
+			landscapeOut[k, dim] = landscapes(pairs, grid, settings["numLandscapes"])
+			norms[k, dim] = landscapeNorms(landscapeOut[k, dim], grid, reference[dim])
+
+	h0.flush()
+	landscapeOut.flush()
+	norms.flush()
+	return h1Rows
+
+def persistence(filename, distanceFile, dates = None, h1 = False, maxScale = 2, numLandscapes = 5, gridSize = 200, chunkSize = 128, numWorkers = None, verbose = True):
+	"""
+	Calculate the persistent homology of the Vietoris-Rips filtration of each distance matrix in the stack `distanceFile` (as written by rollingDistance.rollingDistances), as generatePlot in script.r does with ripsDiag for each date, but streaming the results to disk rather than keeping every diagram.
+	H0 comes from the minimum spanning tree of each date (its edge lengths are the deaths, with one class living to `maxScale`). If `h1`, H1 is calculated as well from the complex of the edges no longer than `maxScale` (see h1Pairs).
+	The dates (indices into the stack, all of them by default) are split into chunks of `chunkSize` shared among `numWorkers` processes. For each date the H0 deaths are written to `filename`.h0.npy, the first `numLandscapes` landscapes of each dimension on `gridSize` points to `filename`.landscapes.npy, and their L1 and L2 norms and L2 distance from the landscapes of the first date (in place of script.r's Wasserstein distance from the first diagram) to `filename`.norms.npy. The H1 pairs are written to `filename`.h1.npy as rows of (date index, birth, death).
+	Returns the norms.
+	"""
+	distances = np.load(distanceFile, mmap_mode = "r")
+	dates = np.arange(len(distances)) if dates is None else np.asarray(dates)
+	if len(dates) == 0:
+		raise ValueError("no dates selected")
+	if not np.all(np.diff(dates) == 1):
+		raise ValueError("dates must be a range of consecutive indices")
+	numDims = 2 if h1 else 1
+	settings = {"h1": h1, "maxScale": maxScale, "numLandscapes": numLandscapes, "gridSize": gridSize}
+
+	shape = (len(distances), numDims)
+	np.lib.format.open_memmap(f"{filename}.h0.npy", mode = "w+", dtype = np.float64, shape = (len(distances), distances.shape[1] - 1))[:] = np.nan
+	np.lib.format.open_memmap(f"{filename}.landscapes.npy", mode = "w+", dtype = np.float64, shape = shape + (numLandscapes, gridSize))
+	np.lib.format.open_memmap(f"{filename}.norms.npy", mode = "w+", dtype = np.float64, shape = shape + (3,))[:] = np.nan
+	startTime = time.time()
+
+	# The first date is needed by every chunk as the reference, so it is done first and its distance from itself set to 0
+	h1Rows = processChunk((distanceFile, filename, dates[0], dates[0] + 1, settings, np.zeros((numDims, numLandscapes, gridSize))))
+	reference = np.array(np.load(f"{filename}.landscapes.npy", mmap_mode = "r")[dates[0]])
+	norms = np.load(f"{filename}.norms.npy", mmap_mode = "r+")
+	norms[dates[0], :, 2] = 0
+	norms.flush()
+	del norms
+
+	args = [(distanceFile, filename, start, min(start + chunkSize, dates[-1] + 1), settings, reference) for start in range(dates[0] + 1, dates[-1] + 1, chunkSize)]
+	with Pool(numWorkers) as pool:
+		for k, rows in enumerate(pool.imap(processChunk, args)):
+			h1Rows.extend(rows)
+			if verbose: print(f"{k + 1}/{len(args)} chunks, {time.time() - startTime:.1f}s")
+
+	np.save(f"{filename}.h1.npy", np.array(h1Rows, dtype = float).reshape(-1, 3))
+	with open(f"{filename}.json", "w") as f:
+		json.dump({**settings, "distanceFile": distanceFile, "dates": [int(dates[0]), int(dates[-1])]}, f)
+	return np.load(f"{filename}.norms.npy", mmap_mode = "r")
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Calculate persistence barcodes, landscapes and norms for every date of a stack of distance matrices.")
+	parser.add_argument("distances", nargs = "?", default = "distances", help = "prefix of the files written by rollingDistance.py")
+	parser.add_argument("--start", default = None, help = "the first date to use (YYYY-MM-DD)")
+	parser.add_argument("--end", default = None, help = "the last date to use (YYYY-MM-DD)")
+	parser.add_argument("--h1", action = "store_true", help = "calculate H1 as well as H0")
+	parser.add_argument("--maxScale", type = float, default = 2, help = "the largest distance in the filtration (smaller makes H1 quicker)")
+	parser.add_argument("--workers", type = int, default = None, help = "number of worker processes")
+	parser.add_argument("--output", default = "persistence", help = "prefix of the output files")
+	args = parser.parse_args()
+
+	# The dates are stored as days since 1970-01-01
+	dayNumbers = np.load(f"{args.distances}.dates.npy")
+	epoch = datetime.date(1970, 1, 1)
+	start = (datetime.date.fromisoformat(args.start) - epoch).days if args.start else dayNumbers[0]
+	end = (datetime.date.fromisoformat(args.end) - epoch).days if args.end else dayNumbers[-1]
+	dates = np.flatnonzero((dayNumbers >= start) & (dayNumbers <= end))
+
+	norms = persistence(args.output, f"{args.distances}.npy", dates, args.h1, args.maxScale, numWorkers = args.workers)
+	print(f"Largest L2 distance from the first date: {np.nanmax(norms[dates, 0, 2]):.4f} (H0)" + (f", {np.nanmax(norms[dates, 1, 2]):.4f} (H1)" if args.h1 else ""))
@@ -0,0 +1,80 @@
+import numpy as np
+import argparse
+import csv
+import json
+
+def loadPrices(filename):
+	"""
+	Load the price panel written by importData in script.r (a Date column of days since 1970-01-01, then one column of prices per company, with NA where there is no price) into one contiguous array.
+	Returns the dates, the company names and the (number of dates, number of companies) prices, with nan in place of NA.
+	"""
+	with open(filename) as f:
+		names = next(csv.reader(f))[1:]
+	data = np.genfromtxt(filename, delimiter = ",", skip_header = 1, missing_values = "NA", filling_values = np.nan)
+	return data[:, 0].astype(np.int64), names, np.ascontiguousarray(data[:, 1:])
+
+def logReturns(dates, prices):
+	"""
+	Return the dates and log returns log(p_t / p_(t - 1)) of `prices`, one row shorter since the first date has no return (nan where either price is missing).
+	"""
+	return dates[1:], np.diff(np.log(prices), axis = 0)
+
+def rollingDistances(filename, dates, values, horizonT, subLevel = True, refresh = 256, verbose = True):
+	"""
+	Calculate the distance sqrt(2 * (1 - correlation)) between every pair of columns of `values` over each window of `horizonT` rows, for every window in turn, as distance in script.r does for one pair and one window at a time.
+	Rather than taking each window from scratch, the sums of each column and of the products of each pair over the window are updated as it slides one row along (adding the new row and removing the old one), so that each window costs O(N^2) for N columns rather than O(N^2 horizonT). The values are shifted by the mean of their column first, and the sums are recalculated from scratch every `refresh` windows, to keep the rounding errors from building up.
+	As with calcNetwork, the distances are subtracted from 2 if not `subLevel` and the diagonal is set to 2. Pairs where either column has a missing value in the window are nan, as R's cor gives NA for them.
+	The distance matrices are written to the memory-mapped file `filename`.npy as a (len(values) - horizonT + 1, N, N) stack, and the date at the end of each window to `filename`.dates.npy. Returns the stack.
+	"""
+	numRows, N = values.shape
+	numWindows = numRows - horizonT + 1
+	if numWindows < 1:
+		raise ValueError(f"horizonT = {horizonT} is longer than the data")
+
+	out = np.lib.format.open_memmap(f"{filename}.npy", mode = "w+", dtype = np.float64, shape = (numWindows, N, N))
+	np.save(f"{filename}.dates.npy", dates[horizonT - 1:])
+
+	valid = np.isfinite(values)
+	shift = np.sum(np.where(valid, values, 0), axis = 0) / np.maximum(np.count_nonzero(valid, axis = 0), 1)
+	x, isMissing = np.where(valid, values - shift, 0), (~valid).astype(np.int64)
+
+	for k in range(numWindows):
+		if k % refresh == 0:
+			window = slice(k, k + horizonT)
+			missing, S, P = isMissing[window].sum(axis = 0), x[window].sum(axis = 0), x[window].T @ x[window]
+		else:
+			old, new = k - 1, k + horizonT - 1
+			missing += isMissing[new] - isMissing[old]
+			S += x[new] - x[old]
+			P += np.outer(x[new], x[new]) - np.outer(x[old], x[old])
+
+		# The correlation of every pair from the sums
+		cov = P - np.outer(S, S) / horizonT
+		var = np.diag(cov).copy()
+		var[(var <= 0) | (missing > 0)] = np.nan
+		with np.errstate(invalid = "ignore"):
+			distance = np.sqrt(2 * (1 - np.clip(cov / np.sqrt(np.outer(var, var)), -1, 1)))
+
+		out[k] = distance if subLevel else 2 - distance
+		np.fill_diagonal(out[k], 2)
+		if verbose and (k + 1) % 1000 == 0: print(f"{k + 1}/{numWindows} windows")
+
+	out.flush()
+	return out
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Calculate the correlation distance between every pair of companies over a rolling time horizon.")
+	parser.add_argument("priceFile", nargs = "?", default = "djiaPrices.csv", help = "the price panel, as written by importData in script.r")
+	parser.add_argument("--horizon", type = int, default = 15, help = "the size of the time horizon (in rows of the data)")
+	parser.add_argument("--prices", action = "store_true", help = "correlate the prices themselves, as script.r does, rather than their log returns")
+	parser.add_argument("--superLevel", action = "store_true", help = "subtract the distances from 2, for super-level sets")
+	parser.add_argument("--output", default = "distances", help = "prefix of the output files")
+	args = parser.parse_args()
+
+	dates, names, prices = loadPrices(args.priceFile)
+	if not args.prices:
+		dates, prices = logReturns(dates, prices)
+	distances = rollingDistances(args.output, dates, prices, args.horizon, not args.superLevel)
+	with open(f"{args.output}.json", "w") as f:
+		json.dump({"names": names, "horizonT": args.horizon, "returns": not args.prices, "subLevel": not args.superLevel}, f)
+	print(f"{len(distances)} distance matrices of {len(names)} companies written to {args.output}.npy")